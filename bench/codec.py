@@ -0,0 +1,106 @@
+""" encoding of `didOpen`/`didChange` with multi-MB text:
+    previous path (`.dict()` copies + `json.dumps`) vs io_handler codecs;
+    cudatext is not needed.  Python 3.6-3.10 (bundled pydantic 1.8), orjson -- optional
+
+    python bench/codec.py [size MB] [runs]
+"""
+import os
+import sys
+import json
+import time
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path[:0] = [PLUGIN_DIR, os.path.join(PLUGIN_DIR, 'lsp_modules')]
+
+from sansio_lsp_client import io_handler
+from sansio_lsp_client.io_handler import _make_headers, _make_request, JsonCodec, OrjsonCodec
+from sansio_lsp_client.structs import (TextDocumentItem, VersionedTextDocumentIdentifier,
+                                       TextDocumentContentChangeEvent)
+
+URI = 'file:///tmp/bench/big_file.py'
+LINE_ASCII = '    result = compute_value(alpha, beta) + 42  # comment\n'
+LINE_UTF8 = '    имя = "значение"  # коментар, ünïcödé\n'
+
+
+def make_text(size, line):
+    return line * (size // len(line.encode('utf-8')) + 1)
+
+
+def old_make_request(method, params=None, id=None, *, encoding='utf-8'):
+    """ io_handler._make_request before the codec layer """
+    request = bytearray()
+    content = {'jsonrpc': '2.0', 'method': method}
+    if params is not None:
+        content['params'] = params
+    if id is not None:
+        content['id'] = id
+    encoded_content = json.dumps(content).encode(encoding)
+    request += _make_headers(content_length=len(encoded_content), encoding=encoding)
+    request += encoded_content
+    return request
+
+
+def old_did_open(doc):
+    return old_make_request('textDocument/didOpen', {'textDocument': doc.dict()})
+
+def old_did_change(docid, changes):
+    return old_make_request('textDocument/didChange', {
+        'textDocument': docid.dict(),
+        'contentChanges': [evt.dict() for evt in changes],
+    })
+
+def new_did_open(doc):
+    return _make_request('textDocument/didOpen', {'textDocument': doc})
+
+def new_did_change(docid, changes):
+    return _make_request('textDocument/didChange', {
+        'textDocument': docid,
+        'contentChanges': changes,
+    })
+
+
+def best_ms(f, args, runs):
+    best = float('inf')
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        f(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main():
+    size_mb = float(sys.argv[1])  if len(sys.argv) > 1 else  4
+    runs = int(sys.argv[2])  if len(sys.argv) > 2 else  30
+
+    codecs = [JsonCodec()]
+    try:
+        codecs.append(OrjsonCodec())
+    except ImportError:
+        print('orjson: not installed, skipped')
+
+    print('python {}, {} MB text, best of {} runs, ms'.format(sys.version.split()[0], size_mb, runs))
+    print('{:<18} {:>10}'.format('', 'previous') + ''.join('{:>10}'.format(c.name) for c in codecs))
+    for kind,line in (('ascii', LINE_ASCII), ('non-ascii', LINE_UTF8)):
+        text = make_text(int(size_mb * 2**20), line)
+        doc = TextDocumentItem(uri=URI, languageId='python', version=1, text=text)
+        docid = VersionedTextDocumentIdentifier(uri=URI, version=2)
+        changes = [TextDocumentContentChangeEvent(text=text)]
+
+        for name,old_f,new_f,args in (
+                    ('didOpen', old_did_open, new_did_open, (doc,)),
+                    ('didChange', old_did_change, new_did_change, (docid, changes)),
+                ):
+            old_bytes = old_f(*args)
+            row = '{:<18} {:10.1f}'.format(name + ' ' + kind, best_ms(old_f, args, runs))
+            for codec in codecs:
+                io_handler.set_codec(codec)
+                new_bytes = new_f(*args)
+                # same message, modulo separators and escaping
+                assert json.loads(new_bytes.split(b'\r\n\r\n', 1)[1]) \
+                        == json.loads(old_bytes.split(b'\r\n\r\n', 1)[1])
+                row += '{:10.1f}'.format(best_ms(new_f, args, runs))
+            print(row)
+
+
+if __name__ == '__main__':
+    main()
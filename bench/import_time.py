@@ -0,0 +1,64 @@
+""" import cost of plugin's pure python dependencies, by `python -X importtime`;
+    cudatext is not needed.  Python 3.6-3.10 (bundled pydantic 1.8)
+
+    python bench/import_time.py [runs]
+"""
+import os
+import sys
+import subprocess
+import statistics
+from collections import defaultdict
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+# imported by `language._import_lsp()` on first Language(), and by document filters with 'pattern'
+IMPORTS = ('sansio_lsp_client.client', 'wcmatch.glob')
+SHOWN = (
+    'pydantic',
+    'sansio_lsp_client.structs',
+    'sansio_lsp_client.events',
+    'sansio_lsp_client.io_handler',
+    'sansio_lsp_client.client',
+    'sansio_lsp_client',
+    'wcmatch.glob',
+)
+TOP_SELF = 10
+
+
+def run_once():
+    """ returns: {module: (self us, cumulative us)}
+    """
+    code = 'import sys; sys.path[:0] = {!r}\n'.format([PLUGIN_DIR, os.path.join(PLUGIN_DIR, 'lsp_modules')])
+    code += ''.join('import {}\n'.format(name)  for name in IMPORTS)
+    res = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    times = {}
+    for line in res.stderr.splitlines():
+        if not line.startswith('import time:')  or  'self [us]' in line:
+            continue
+        self_us,cum_us,name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cum_us))
+    return times
+
+
+def main():
+    runs = int(sys.argv[1])  if len(sys.argv) > 1 else  5
+    samples = defaultdict(list)
+    for _ in range(runs):
+        for name,t in run_once().items():
+            samples[name].append(t)
+
+    def median(name, i):
+        return statistics.median(t[i]  for t in samples[name]) / 1000
+
+    print('python {}, median of {} runs, ms'.format(sys.version.split()[0], runs))
+    print('{:>10} {:>10}  {}'.format('self', 'cumul.', 'module'))
+    for name in SHOWN:
+        if name in samples:
+            print('{:10.1f} {:10.1f}  {}'.format(median(name, 0), median(name, 1), name))
+    print('\ntop {} by self time:'.format(TOP_SELF))
+    for name in sorted(samples, key=lambda name: -median(name, 0))[:TOP_SELF]:
+        print('{:10.1f} {:10.1f}  {}'.format(median(name, 0), median(name, 1), name))
+
+
+if __name__ == '__main__':
+    main()
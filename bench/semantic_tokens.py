@@ -0,0 +1,136 @@
+""" semantic tokens of a large document: full load, delta apply, visible-lines decode and render;
+    outside CudaText `cudatext` is replaced by a minimal stand-in: render cost excludes the editor
+
+    python bench/semantic_tokens.py [tokens] [runs]
+"""
+import os
+import sys
+import time
+import types
+import random
+from itertools import accumulate
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path[:0] = [PLUGIN_DIR]
+
+try:
+    import cudatext
+except ImportError:
+    cudatext = types.ModuleType('cudatext')
+    cudatext.PROC_GET_UNIQUE_TAG = 'PROC_GET_UNIQUE_TAG'
+    cudatext.PROC_THEME_SYNTAX_DICT_GET = 'PROC_THEME_SYNTAX_DICT_GET'
+    cudatext.MARKERS_DELETE_BY_TAG = 'MARKERS_DELETE_BY_TAG'
+    cudatext.MARKERS_ADD_MANY = 'MARKERS_ADD_MANY'
+    cudatext.COLOR_NONE = 0x1FFFFFFF
+    def _app_proc(id, val):
+        if id == cudatext.PROC_THEME_SYNTAX_DICT_GET:
+            return {name: {'color_font': 0xFF}  for name in ('Id1', 'Id2', 'Id3', 'Id4', 'IdVar')}
+        return 1
+    cudatext.app_proc = _app_proc
+    sys.modules['cudatext'] = cudatext
+
+from semantic import SemanticTokens, render_tokens
+
+TOKENS_PER_LINE = 8
+VISIBLE_LINES = 60
+MARGIN = 100 # as language.SEMTOK_MARGIN
+LEGEND = {
+    'tokenTypes': ['namespace', 'type', 'class', 'enum', 'interface', 'struct', 'typeParameter',
+                    'parameter', 'variable', 'property', 'enumMember', 'function', 'method',
+                    'macro', 'keyword', 'comment', 'string', 'number', 'operator', 'decorator'],
+    'tokenModifiers': ['declaration', 'definition', 'readonly', 'static', 'deprecated'],
+}
+
+
+class Editor:
+    """ counts `attr()` calls, keeps nothing """
+    def __init__(self):
+        self.calls = 0
+
+    def attr(self, id, **kwargs):
+        self.calls += 1
+
+
+def make_data(count, rnd):
+    """ returns: list of ints, as received in `SemanticTokens.data` """
+    data = []
+    for i in range(count):
+        new_line = i % TOKENS_PER_LINE == 0
+        data += (1  if new_line else  0,  rnd.randint(2, 8)  if new_line else  rnd.randint(3, 12),
+                rnd.randint(1, 20),  rnd.randrange(len(LEGEND['tokenTypes'])),  rnd.choice((0, 0, 0, 1, 16)))
+    return data
+
+
+def make_edits(count, edits_count, rnd):
+    """ returns: `SemanticTokensEdit` dicts, as for a few lines changed -- a token replaced by two """
+    edits = []
+    for start in sorted(rnd.sample(range(count), edits_count)):
+        edits.append({'start': start*5,  'deleteCount': 5,  'data': [0, 4, 3, 7, 0,  0, 2, 5, 11, 0]})
+    return edits
+
+
+def best_ms(f, runs, setup=None):
+    best = float('inf')
+    for _ in range(runs):
+        arg = setup()  if setup else  None
+        t0 = time.perf_counter()
+        f(arg)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main():
+    count = int(sys.argv[1])  if len(sys.argv) > 1 else  100000
+    runs = int(sys.argv[2])  if len(sys.argv) > 2 else  20
+
+    rnd = random.Random(0)
+    data = make_data(count, rnd)
+    lines = count // TOKENS_PER_LINE
+    mid = lines // 2
+    line0,line1 = mid - MARGIN,  mid + VISIBLE_LINES + MARGIN
+
+    def loaded(_=None):
+        return SemanticTokens(data, '1')
+
+    def decoded(_=None):
+        stoks = loaded()
+        stoks.get_tokens(line0, line1)
+        return stoks
+
+    rows = []
+    rows.append(('full load', best_ms(loaded, runs)))
+    for n in (1, 10, 100):
+        edits = make_edits(count, n, rnd)
+        rows.append(('delta apply, {} edits'.format(n),
+                        best_ms(lambda stoks: stoks.apply_edits(edits, '2'),  runs, setup=loaded)))
+    rows.append(('visible decode, first',  best_ms(lambda stoks: stoks.get_tokens(line0, line1),  runs, setup=loaded)))
+    rows.append(('visible decode, next',  best_ms(lambda stoks: stoks.get_tokens(line0, line1),  runs, setup=decoded)))
+    tokens = decoded().get_tokens(line0, line1)
+    ed = Editor()
+    rows.append(('render visible',  best_ms(lambda _: render_tokens(ed, tokens, LEGEND),  runs)))
+
+    # for reference: every token to absolute position, as if whole document were rendered
+    def decode_all(_):
+        d = data
+        col = 0
+        out = []
+        for i,line in enumerate(accumulate(d[0::5])):
+            j = i*5
+            col = d[j+1]  if d[j] else  col + d[j+1]
+            out.append((line, col, d[j+2], d[j+3], d[j+4]))
+    rows.append(('(decode all tokens)',  best_ms(decode_all, runs)))
+
+    stoks = loaded()
+    print('python {}, {} tokens, {} lines, rendered lines {}, best of {} runs'.format(
+            sys.version.split()[0], count, lines, line1-line0, runs))
+    print('data: {:.1f} MB in array, received list: {:.1f} MB of pointers alone'.format(
+            stoks.data.buffer_info()[1] * stoks.data.itemsize / 2**20,  sys.getsizeof(data) / 2**20))
+    for name,ms in rows:
+        print('{:<24} {:8.2f} ms'.format(name, ms))
+    ed = Editor()
+    render_tokens(ed, tokens, LEGEND)
+    print('visible tokens: {}, MARKERS_ADD_MANY calls: {}'.format(len(tokens), ed.calls - 1))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,7 @@ from difflib import SequenceMatcher
 from cudatext import *
 #from cudax_lib import get_translation
 
-from .util import get_first, lex2langid, ed_uri
+from .util import lex2langid, ed_uri
 
 #from .sansio_lsp_client import structs
 
@@ -17,6 +17,7 @@ import datetime
 class DocBook:
     def __init__(self):
         self.docs = {} # uri => Document
+        self._h_docs = {} # editor handle => Document
 
     def new_doc(self, ed):
         global structs
@@ -24,6 +25,7 @@ class DocBook:
 
         doc = EditorDoc(ed)
         self.docs[doc.uri] = doc
+        self._h_docs[doc.h_ed] = doc
 
     def get_doc(self, ed=None, uri=None):
         return self._get_doc(ed=ed, uri=uri)
@@ -36,18 +38,30 @@ class DocBook:
     def on_close(self, ed):
         eddoc = self._get_doc(ed=ed)
         del self.docs[eddoc.uri]
+        del self._h_docs[eddoc.h_ed]
+
+    def on_rename(self, ed):
+        """ editor's file changed (save as, rename) -- re-key doc by new uri
+        """
+        eddoc = self._get_doc(ed=ed)
+        if eddoc:
+            if self.docs.get(eddoc.uri) is eddoc:
+                del self.docs[eddoc.uri]
+            eddoc.update_uri()
+            self.docs[eddoc.uri] = eddoc
 
     def _get_doc(self, *args, ed=None, uri=None):
         assert not args, 'only call _get_doc() w/ named arguments'
 
         if ed is not None:
-            return get_first(doc for doc in self.docs.values()  if doc.ed == ed)
+            return self._h_docs.get(ed.get_prop(PROP_HANDLE_SELF))
         elif uri is not None:
-            return self.docs[uri]
+            return self.docs.get(uri)
 
 class EditorDoc:
     def __init__(self, ed):
         self._ed = ed
+        self._h_ed = ed.get_prop(PROP_HANDLE_SELF)
         self._txt = ed.get_text_all()
         self._ver = 1
         self._uri = ed_uri(ed)
@@ -67,6 +81,8 @@ class EditorDoc:
     @property
     def ed(self): return self._ed
     @property
+    def h_ed(self): return self._h_ed
+    @property
     def langid(self): return self._langid
     @property
     def lang(self): return self._lang
@@ -82,6 +98,9 @@ class EditorDoc:
             raise Exception('Closeing unopened doc: {self.uri}')
         self._lang = None
 
+    def update_uri(self):
+        self._uri = ed_uri(self._ed)
+
     def update(self, lang=None):
         self._lex = self._ed.get_prop(PROP_LEXER_FILE)
         self._langid = lex2langid(self._lex)
@@ -230,6 +249,94 @@ class EditorDoc:
         else:
             ed.replace(x1,y1,x2,y2, edit.newText)
 
+    def apply_edits(ed, edits):
+        """ applies list of non-overlapping TextEdit's as a single editor replace:
+                one undo step and relayout, instead of one per edit
+            returns: True if text changed
+        """
+        if not edits:
+            return False
+
+        lines = ed.get_text_all().split('\n')
+        nlines = len(lines)
+
+        def clamp(pos): #SKIP
+            """ (x,y) of position, positions beyond text end -- at text end
+            """
+            if pos.line >= nlines:
+                return (len(lines[-1]), nlines-1)
+            return (min(pos.character, len(lines[pos.line])), pos.line)
+
+        def text_between(start, end): #SKIP
+            (x0,y0), (x1,y1) = start, end
+            if y0 == y1:
+                return lines[y0][x0:x1]
+            return '\n'.join([lines[y0][x0:],  *lines[y0+1:y1],  lines[y1][:x1]])
+
+        edits = sorted(edits, key=lambda edit: (edit.range.start.line, edit.range.start.character))
+
+        span_start = clamp(edits[0].range.start)
+        pos = span_start
+        pieces = []
+        applied = [] # (start, end, new text) -- clamped, not overlapping;  for carets
+        for edit in edits:
+            start = clamp(edit.range.start)
+            end = clamp(edit.range.end)
+            # overlapping previous edit: merge, skipping already replaced text
+            if (start[1],start[0]) < (pos[1],pos[0]):
+                start = pos
+            if (end[1],end[0]) < (start[1],start[0]):
+                end = start
+
+            pieces.append(text_between(pos, start))
+            pieces.append(edit.newText)
+            applied.append((start, end, edit.newText))
+            pos = end
+        span_end = pos
+
+        new_text = ''.join(pieces)
+        if new_text == text_between(span_start, span_end):
+            return False
+
+        carets = ed.get_carets()
+        line_top = ed.get_prop(PROP_LINE_TOP)
+
+        (x1,y1), (x2,y2) = span_start, span_end
+        if x1==x2 and y1==y2:
+            ed.insert(x1,y1, new_text)
+        else:
+            ed.replace(x1,y1,x2,y2, new_text)
+
+        def move_pos(x, y): #SKIP
+            """ position in old text -> in new text;  inside replaced text -- to its start
+            """
+            for (sx,sy), (ex,ey), text in reversed(applied): # later edits don't shift earlier ones
+                if (y,x) < (sy,sx):
+                    continue
+                if (y,x) < (ey,ex):
+                    x,y = sx,sy
+                    continue
+                nl_count = text.count('\n')
+                if y == ey:
+                    new_ex = len(text) - text.rfind('\n') - 1  if nl_count else  sx + len(text)
+                    x = new_ex + (x - ex)
+                y += nl_count - (ey - sy)
+            return x,y
+
+        # restore carets (moved by edits before them) and scroll
+        line_count = ed.get_line_count()
+        for i,(x0,y0,x1,y1) in enumerate(carets):
+            x0,y0 = move_pos(x0, y0)
+            y0 = min(y0, line_count-1)
+            x0 = min(x0, len(ed.get_text_line(y0) or ''))
+            if y1 >= 0: # selection
+                x1,y1 = move_pos(x1, y1)
+                y1 = min(y1, line_count-1)
+                x1 = min(x1, len(ed.get_text_line(y1) or ''))
+            ed.set_caret(x0,y0, x1,y1,  id=CARET_SET_ONE  if i == 0 else  CARET_ADD)
+        ed.set_prop(PROP_LINE_TOP, line_top)
+        return True
+
     def range2carets(range):
         #x1,y1,x2,y2
         return (range.start.character, range.start.line,  range.end.character, range.end.line,)
@@ -0,0 +1,287 @@
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+SEVERITIES_COUNT = 5 # LSP severities: 1..4, 0 - not specified
+SEVERITY_ERROR = 1
+INTERN_MAX = 4096 # distinct codes and sources kept shared;  table is reset over it
+
+# imported on access
+#from .sansio_lsp_client.structs import Diagnostic, DiagnosticSeverity, Range, Position
+
+
+class FileDiags:
+    """ diagnostics of a single uri, stored column-wise, sorted by start position
+        * positions, severities -- in `array`s
+        * sources, codes -- shared via bounded table: `_intern()`;  messages are mostly unique
+        * `Diagnostic` objects are built only on request: get_diags()
+    """
+    __slots__ = ('y0', 'x0', 'y1', 'x1', 'severity', 'codes', 'messages', 'sources', 'counts')
+
+    def __init__(self, diag_list):
+        diag_list = sorted(diag_list,  key=lambda d: (d.range.start.line, d.range.start.character))
+
+        self.y0 = array('l', (d.range.start.line       for d in diag_list))
+        self.x0 = array('l', (d.range.start.character  for d in diag_list))
+        self.y1 = array('l', (d.range.end.line         for d in diag_list))
+        self.x1 = array('l', (d.range.end.character    for d in diag_list))
+        self.severity = array('b', (d.severity or 0  for d in diag_list)) # 0 - no severity
+
+        self.codes = [_intern(d.code)  for d in diag_list]
+        self.messages = [d.message  for d in diag_list]
+        self.sources = [_intern(d.source)  for d in diag_list]
+
+        self.counts = [self.severity.count(sev)  for sev in range(SEVERITIES_COUNT)]
+
+    def __len__(self):
+        return len(self.y0)
+
+    def line_range(self, line0, line1):
+        """ returns: (start, end) indexes of diagnostics starting on lines [line0, line1)
+        """
+        return bisect_left(self.y0, line0),  bisect_left(self.y0, line1)
+
+    def get_diags(self, start=0, end=None):
+        """ builds `Diagnostic`s, without validation -- data was validated on receive
+        """
+        global Diagnostic, DiagnosticSeverity, Range, Position
+        from .sansio_lsp_client.structs import Diagnostic, DiagnosticSeverity, Range, Position
+
+        if end is None:
+            end = len(self)
+
+        diags = []
+        for i in range(start, end):
+            _start = Position.construct(line=self.y0[i], character=self.x0[i])
+            _end = Position.construct(line=self.y1[i], character=self.x1[i])
+            severity = self.severity[i]
+            diags.append(Diagnostic.construct(
+                range       = Range.construct(start=_start, end=_end),
+                severity    = DiagnosticSeverity(severity) if severity else None,
+                code        = self.codes[i],
+                source      = self.sources[i],
+                message     = self.messages[i],
+                relatedInformation = None,
+            ))
+        return diags
+
+    def get_counts(self):
+        """ returns: list of diagnostics counts;  index - severity, 0 - no severity
+        """
+        return list(self.counts)
+
+    def get_errors(self):
+        """ returns: (lines, columns) arrays of errors' start positions, sorted
+        """
+        inds = [i  for i,sev in enumerate(self.severity)  if sev == SEVERITY_ERROR]
+        return array('l', (self.y0[i] for i in inds)),  array('l', (self.x0[i] for i in inds))
+
+    def get_size(self):
+        """ approximate size in bytes;  shared strings are counted once per file
+        """
+        size = sum(sys.getsizeof(arr)  for arr in (self.y0, self.x0, self.y1, self.x1, self.severity))
+        size += sum(sys.getsizeof(lst)  for lst in (self.codes, self.messages, self.sources))
+        _strs = {id(s):s  for lst in (self.codes, self.messages, self.sources)  for s in lst
+                                                                        if s is not None}
+        size += sum(sys.getsizeof(s)  for s in _strs.values())
+        return size
+
+
+class ProblemsIndex:
+    """ workspace problems of all servers: uri -> {owner: FileDiags} (shared with servers' `DiagStore`s)
+        * servers publishing for same uri are kept apart -- by `owner`
+        * per-file and total per-severity counts -- updated by deltas of publishing owner
+        * uris with errors + per-file sorted error positions -- next/prev error in O(log n);
+            uris are sorted on navigation, if changed
+    """
+    def __init__(self):
+        self._files = {} # uri -> {owner: FileDiags}
+        self._counts = {} # uri -> list of counts by severity, of all owners
+        self.totals = [0]*SEVERITIES_COUNT
+        self._err_uris = set()
+        self._err_uris_sorted = [] # None -- `_err_uris` changed
+        self._errs = {} # uri -> (lines, columns)
+        self.version = 0 # incremented on every change
+
+        self.on_change = None # callback, no args
+
+    def __len__(self):
+        return sum(self.totals)
+
+    def update(self, uri, fdiags, owner=None):
+        """ fdiags -- FileDiags or None
+            owner -- publisher of `fdiags`, e.g. server's diagnostics manager
+        """
+        owners = self._files.get(uri)
+        old = owners.pop(owner, None)  if owners else  None
+        if old is None  and  not fdiags:
+            return
+
+        if fdiags:
+            if owners is None:
+                owners = self._files[uri] = {}
+            owners[owner] = fdiags
+        elif not owners:
+            del self._files[uri]
+
+        counts = self._counts.get(uri)
+        if counts is None:
+            counts = self._counts[uri] = [0]*SEVERITIES_COUNT
+        for fd,sign in ((old, -1), (fdiags, 1)):
+            if fd:
+                for sev,count in enumerate(fd.counts):
+                    counts[sev] += sign*count
+                    self.totals[sev] += sign*count
+
+        if not owners:
+            del self._counts[uri]
+        if counts[SEVERITY_ERROR]:
+            if uri not in self._err_uris:
+                self._err_uris.add(uri)
+                self._err_uris_sorted = None
+            if (old  and  old.counts[SEVERITY_ERROR])  or  (fdiags  and  fdiags.counts[SEVERITY_ERROR]):
+                self._errs[uri] = _merge_errors([fd.get_errors()  for fd in owners.values()
+                                                                    if fd.counts[SEVERITY_ERROR]])
+        elif uri in self._err_uris:
+            self._err_uris.discard(uri)
+            self._err_uris_sorted = None
+            del self._errs[uri]
+
+        self.version += 1
+        if self.on_change:
+            self.on_change()
+
+    def get_counts(self, uri=None):
+        """ returns: per-severity counts of single file, or total
+        """
+        if uri is None:
+            return list(self.totals)
+        return self._counts.get(uri) or [0]*SEVERITIES_COUNT
+
+    def get_files(self):
+        """ returns: list of (uri, FileDiags), sorted by uri;  uri repeats for each publishing server
+        """
+        return sorted(((uri, fdiags)  for uri,owners in self._files.items()  for fdiags in owners.values()),
+                        key=lambda item: item[0])
+
+    def next_error(self, uri, line, column):
+        """ returns: (uri, line, column) of first error after position in `uri` or in following files,
+                wraps around;  None if no errors
+        """
+        if not self._err_uris:
+            return None
+
+        errs = self._errs.get(uri)
+        if errs:
+            lines,cols = errs
+            # after `column` among errors on `line`, then -- on following lines
+            i = bisect_right(cols, column,  bisect_left(lines, line),  bisect_right(lines, line))
+            if i < len(lines):
+                return uri, lines[i], cols[i]
+
+        uris = self._get_err_uris()
+        uri = uris[bisect_right(uris, uri) % len(uris)]
+        lines,cols = self._errs[uri]
+        return uri, lines[0], cols[0]
+
+    def prev_error(self, uri, line, column):
+        """ returns: (uri, line, column) of last error before position in `uri` or in preceding files,
+                wraps around;  None if no errors
+        """
+        if not self._err_uris:
+            return None
+
+        errs = self._errs.get(uri)
+        if errs:
+            lines,cols = errs
+            i = bisect_left(cols, column,  bisect_left(lines, line),  bisect_right(lines, line))
+            if i > 0:
+                return uri, lines[i-1], cols[i-1]
+
+        uris = self._get_err_uris()
+        uri = uris[bisect_left(uris, uri) - 1] # -1 -- wraps to last
+        lines,cols = self._errs[uri]
+        return uri, lines[-1], cols[-1]
+
+    def _get_err_uris(self):
+        if self._err_uris_sorted is None:
+            self._err_uris_sorted = sorted(self._err_uris)
+        return self._err_uris_sorted
+
+
+class DiagStore:
+    """ uri -> FileDiags;  uris without diagnostics are not kept
+    """
+    def __init__(self):
+        self._files = {}
+
+    def __contains__(self, uri):
+        return uri in self._files
+
+    def set(self, uri, diag_list):
+        """ returns: FileDiags, or None if no diagnostics
+        """
+        if diag_list:
+            fdiags = self._files[uri] = FileDiags(diag_list)
+            return fdiags
+        else:
+            self._files.pop(uri, None)
+
+    def get(self, uri):
+        return self._files.get(uri)
+
+    def get_uris(self):
+        return list(self._files)
+
+    def pop(self, uri):
+        return self._files.pop(uri, None)
+
+    def get_stats(self):
+        return {
+            'files': len(self._files),
+            'diagnostics': sum(len(fdiags)  for fdiags in self._files.values()),
+            'bytes': sum(fdiags.get_size()  for fdiags in self._files.values()),
+        }
+
+
+def _merge_errors(errs):
+    """ errs -- list of (lines, columns) arrays
+        returns: (lines, columns), sorted by position
+    """
+    if len(errs) == 1:
+        return errs[0]
+    positions = sorted((y,x)  for lines,cols in errs  for y,x in zip(lines, cols))
+    return array('l', (y for y,x in positions)),  array('l', (x for y,x in positions))
+
+_interned = {} # str -> same str;  not `sys.intern()` -- that table is never trimmed
+
+def _intern(val):
+    if not isinstance(val, str):
+        return val
+    s = _interned.get(val)
+    if s is None:
+        if len(_interned) >= INTERN_MAX:
+            _interned.clear()
+        s = _interned[val] = val
+    return s
+
+def estimate_size(obj, _seen=None):
+    """ approximate deep size of received objects in bytes -- for comparison in debug output
+    """
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen)  for k,v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(estimate_size(item, _seen)  for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += estimate_size(obj.__dict__, _seen)
+        fields_set = getattr(obj, '__fields_set__', None)
+        if fields_set is not None:
+            size += estimate_size(fields_set, _seen)
+    return size
@@ -1,7 +1,10 @@
 import os
-from collections import namedtuple, defaultdict
+from bisect import bisect_right
+from collections import namedtuple, defaultdict, deque
+from heapq import merge
 
 from cudatext import *
+from cudatext_keys import VK_ENTER, VK_UP, VK_DOWN
 #import cudatext as ct
 import cudax_lib as apx
 
@@ -9,7 +12,7 @@ import cudax_lib as apx
 #from .sansio_lsp_client.structs import MarkupKind
 #from .sansio_lsp_client.events import ShowMessage, LogMessage
 
-LogMsg = namedtuple('LogMsg', 'msg type severity')
+LogMsg = namedtuple('LogMsg', 'msg type severity seq')
 
 _   = apx.get_translation(__file__)  # I18N
 
@@ -21,6 +24,10 @@ FORM_GAP = 4
 
 CURSOR_MOVE_TOLERANCE = 30
 
+LOG_PANEL_MAX_MSGS = 5000 # older messages are dropped
+LOG_PANEL_FLUSH_PERIOD = 100 # ms, new messages are added to memo in batches
+LOG_PANEL_DECOR_MARGIN = 100 # lines around visible, severity icons are set for
+
 def is_mouse_in_form(h_dlg):
     prop = dlg_proc(h_dlg, DLG_PROP_GET)
     if not prop['vis']: return False
@@ -331,25 +338,43 @@ class PanelLog:
 
     fn_icon = os.path.join(os.path.dirname(__file__), 'icons', 'lsp.png')
 
-    panels = {} # name to instance
+    panels = {} # (name, root dir) to instance;  servers of other project folders have own panels
 
     _colors = None
 
     TAG_ED_MENU_WRAP = 'ed_wrap'
 
-    def __init__(self, panel_name, state=None):
+    def __init__(self, panel_name, state=None, root=None):
         global LogMessage, ShowMessage
         from .sansio_lsp_client import LogMessage, ShowMessage
 
-        PanelLog.panels[panel_name] = self
+        # same server for another folder -- folder name in caption
+        if any(name == panel_name  for name,_root in PanelLog.panels):
+            self._caption = '{} ({})'.format(panel_name, os.path.basename(os.path.normpath(root or '')) or '-')
+        else:
+            self._caption = panel_name
+        PanelLog.panels[(panel_name, root)] = self
         PanelLog.type_captions = {
             ShowMessage: TYPE_MSG,
             LogMessage: TYPE_LOG,
         }
 
         self.name = panel_name
-
-        self._msgs = [] # ShowMessage, LogMessage, tuple(type_, str)
+        self.root = root
+
+        self._msgs = deque(maxlen=LOG_PANEL_MAX_MSGS) # LogMsg
+        self._groups = defaultdict(deque) # (type str, severity str) -> LogMsg -- for filter changes
+        self._seq = 0 # of next LogMsg
+        self._pending = deque() # LogMsg -- passed filter, not yet in memo
+        # memo contents
+        self._shown = [] # LogMsg, from `_shown_start`;  older are dropped
+        self._shown_lines = [] # first line of `_shown` item, + `_lines_cut`
+        self._shown_start = 0
+        self._lines_cut = 0 # removed from memo top since full render
+        self._cut_pending = 0 # lines of dropped messages, to remove from memo top
+        self._decorated = set() # seq of LogMsg with severity icon
+        self._msg_counts = defaultdict(int) # type str, severity str -> count;  kept incrementally
+        self._flush_armed = False
         self._extra_types = set() # server stderr, etc
         # filter panel: disabled "categories"
         self._disabled_items = set(state.get('log_panel_filter'))  if isinstance(state, dict) else  set()
@@ -359,6 +384,7 @@ class PanelLog:
         self._severity_ims = {} # severity str -> icon ind in imagelist
         self._have_na_severity = False
         self._sb_cellind_map = {} # name -> cellind
+        self._sb_overlays = {} # cellind -> shown count str
         self._h_btn_sidebar = None
         self._h_ed_menu = None
 
@@ -374,7 +400,7 @@ class PanelLog:
 
     @property
     def sidepanel_name(self):
-        return 'LSP: ' + str(self.name)
+        return 'LSP: ' + str(self._caption)
 
     @property
     def colors(self):
@@ -392,6 +418,7 @@ class PanelLog:
             'name':'memo',
             'align': ALIGN_CLIENT,
             'on_menu': self.on_ed_menu,
+            'on_scroll': self.on_memo_scroll,
             })
         h_memo = dlg_proc(self.h_dlg, DLG_CTL_HANDLE, index=n)
         self._memo = Editor(h_memo)
@@ -465,12 +492,8 @@ class PanelLog:
 
         bg_color = self.colors['TabActive']['color']
 
-        font_enabled_color = self.colors['TabFontActive']['color']
-        font_disabled_color = self.colors['TabFontMod']['color']
-
-        line_enabled_color = 0x7cc87c #7cc87c
-
         self._sb_cellind_map.clear()
+        self._sb_overlays.clear()
 
         # clear
         statusbar_proc(h_sb, STATUSBAR_DELETE_ALL)
@@ -489,15 +512,9 @@ class PanelLog:
             _callback = callbac_fstr.format(name)
             statusbar_proc(h_sb, STATUSBAR_SET_CELL_CALLBACK, index=cellind, value=_callback)
 
-            _font_col = font_disabled_color
-            #if name not in self._disabled_types: # if enabled
-            if name not in self._disabled_items: # if enabled
-                _font_col = font_enabled_color
-                statusbar_proc(h_sb, STATUSBAR_SET_CELL_COLOR_LINE2, index=cellind,
-                                                                        value=line_enabled_color)
             statusbar_proc(h_sb, STATUSBAR_SET_CELL_AUTOSIZE, index=cellind, value=True)
             statusbar_proc(h_sb, STATUSBAR_SET_CELL_COLOR_BACK, index=cellind, value=bg_color)
-            statusbar_proc(h_sb, STATUSBAR_SET_CELL_COLOR_FONT, index=cellind, value=_font_col)
+            self._update_sb_cell_state(name)
 
 
         # add spacer
@@ -518,31 +535,51 @@ class PanelLog:
             statusbar_proc(h_sb, STATUSBAR_SET_CELL_HINT, index=cellind, value=_hint)
             statusbar_proc(h_sb, STATUSBAR_SET_CELL_ALIGN, index=cellind, value='C')
 
-            #_font_col = font_disabled_color
-            if name not in self._disabled_items: # if enabled
-                #_font_col = font_enabled_color
-                statusbar_proc(h_sb, STATUSBAR_SET_CELL_COLOR_LINE2, index=cellind,
-                                                                        value=line_enabled_color)
             statusbar_proc(h_sb, STATUSBAR_SET_CELL_AUTOSIZE, index=cellind, value=True)
             statusbar_proc(h_sb, STATUSBAR_SET_CELL_COLOR_BACK, index=cellind, value=bg_color)
-            #statusbar_proc(h_sb, STATUSBAR_SET_CELL_COLOR_FONT, index=cellind, value=_font_col)
+            self._update_sb_cell_state(name)
 
         self._update_counts()
 
-    def _update_counts(self, *args, **vargs):
-        msg_counts = self._get_msg_counts()
+    def _update_sb_cell_state(self, name):
+        """ filter cell On/Off look:  underline, and font color for text cells
+        """
+        cellind = self._sb_cellind_map[name]
+        is_enabled = name not in self._disabled_items
 
+        line_col = 0x7cc87c  if is_enabled else  self.colors['TabActive']['color'] #7cc87c
+        statusbar_proc(self._h_sb, STATUSBAR_SET_CELL_COLOR_LINE2, index=cellind, value=line_col)
+        if name not in SEVERITYS:
+            _font_col = self.colors['TabFontActive' if is_enabled else 'TabFontMod']['color']
+            statusbar_proc(self._h_sb, STATUSBAR_SET_CELL_COLOR_FONT, index=cellind, value=_font_col)
+
+    def _update_counts(self, *args, **vargs):
+        """ sets only changed counts
+        """
         for name,cellind in self._sb_cellind_map.items():
-            _overlay = msg_counts.get(name, '')
-            statusbar_proc(self._h_sb, STATUSBAR_SET_CELL_OVERLAY, index=cellind, value=str(_overlay))
+            _overlay = str(self._msg_counts.get(name, ''))
+            if self._sb_overlays.get(cellind) != _overlay:
+                self._sb_overlays[cellind] = _overlay
+                statusbar_proc(self._h_sb, STATUSBAR_SET_CELL_OVERLAY, index=cellind, value=_overlay)
 
     def _update_memo(self):
-        self._reset_memo()
-        self._memo.decor(DECOR_DELETE_BY_TAG, tag=PANEL_LOG_TAG)
+        """ full re-render: single set_text_all(), then icons around visible
+            * shown messages are merged from enabled (type, severity) groups -- no full scan
+        """
+        groups = [msgs  for (type_str,severity),msgs in self._groups.items()
+                    if type_str not in self._disabled_items  and  severity not in self._disabled_items]
+        msgs = list(merge(*groups, key=lambda msg: msg.seq))
 
-        for msg in self._msgs:
-            if self._filter_msg(msg):
-                self._append_memo_msg(msg)
+        self._pending.clear()
+        self._reset_memo()
+        self._memo.set_text_all(''.join(msg.msg for msg in msgs))
+        nline = 0
+        for msg in msgs:
+            self._shown_lines.append(nline)
+            nline += msg.msg.count('\n')
+        self._shown = msgs
+        self._memo_pos = (0, nline) # messages end with newline
+        self._decorate_view()
 
     def log(self, msg):   # events: ShowMessage, LogMessage
         severity_str = SEVERITY_MAP[msg.type.value]
@@ -552,14 +589,20 @@ class PanelLog:
         if s and s[-1] != '\n':
             s += '\n'
 
-        lm = LogMsg(s, type=type_, severity=severity)
+        lm = LogMsg(s, type=type_, severity=severity, seq=self._seq)
+        self._seq += 1
 
+        if len(self._msgs) == self._msgs.maxlen: # oldest is dropped
+            self._drop_msg(self._msgs[0])
         self._msgs.append(lm)
+        self._groups[self._get_group(lm)].append(lm)
+        self._count_msg(lm, 1)
         if self._filter_msg(lm):
-            self._append_memo_msg(lm)
+            self._pending.append(lm)
 
-        timer_proc(TIMER_START_ONE, self._update_counts, 500)
-        self._update_sidebar()
+        if not self._flush_armed:
+            self._flush_armed = True
+            timer_proc(TIMER_START_ONE, self._flush, LOG_PANEL_FLUSH_PERIOD)
 
         # add na severity if needed
         if severity == SEVERITY_NA  and  not self._have_na_severity:
@@ -570,8 +613,35 @@ class PanelLog:
             self._extra_types.add(type_)
             self._update_sb()
 
+    def _drop_msg(self, msg):
+        """ oldest `msg` is dropped -- from indexes, and from memo on next flush
+        """
+        self._count_msg(msg, -1)
+        self._groups[self._get_group(msg)].popleft()
+
+        if self._pending  and  self._pending[0] is msg:
+            self._pending.popleft()
+        elif self._shown_start < len(self._shown)  and  self._shown[self._shown_start] is msg:
+            self._shown_start += 1
+            self._cut_pending += msg.msg.count('\n')
+
+    def _flush(self, tag='', info=''):
+        self._flush_armed = False
+
+        if self._cut_pending:
+            self._cut_memo_top()
+        if self._pending:
+            self._append_memo_msgs(self._pending)
+            self._pending.clear()
+        self._decorate_view()
+
+        self._update_counts()
+        self._update_sidebar()
+
     def clear(self):
         self._msgs.clear()
+        self._groups.clear()
+        self._msg_counts.clear()
         self._update_memo()
         self._update_counts()
 
@@ -587,22 +657,66 @@ class PanelLog:
         if self._h_btn_sidebar:
             button_proc(self._h_btn_sidebar, BTN_SET_OVERLAY, str(len(self._msgs)))
 
-    def _append_memo_msg(self, msg):
+    def _append_memo_msgs(self, msgs):
         _nline = self._memo_pos[1]
-        newpos = self._memo.insert(*self._memo_pos, msg.msg)
+        txt = ''.join(msg.msg for msg in msgs)
+        newpos = self._memo.insert(*self._memo_pos, txt)
 
         if newpos is not None:
             self._memo_pos = newpos
-            #### decor icon
-            _imind = self._severity_ims[msg.severity]
-            self._memo.decor(DECOR_SET, line=_nline, image=_imind, tag=PANEL_LOG_TAG)
+            for msg in msgs:
+                self._shown.append(msg)
+                self._shown_lines.append(_nline + self._lines_cut)
+                _nline += msg.msg.count('\n')
         else:
-            print(f'NOTE: LSP: failed to show msg: {type_, len(txt), txt[:64]}')
+            print(f'NOTE: LSP: failed to show msgs: {len(msgs), len(txt), txt[:64]}')
+
+    def _cut_memo_top(self):
+        """ removes lines of dropped messages -- single delete
+        """
+        n = self._cut_pending
+        self._cut_pending = 0
+        self._memo.delete(0, 0, 0, n)
+        self._memo_pos = (self._memo_pos[0],  self._memo_pos[1] - n)
+        self._lines_cut += n
+
+        if self._shown_start > len(self._shown)//2:
+            del self._shown[:self._shown_start]
+            del self._shown_lines[:self._shown_start]
+            self._shown_start = 0
+
+        # icons are set by line index -- lines shifted
+        self._memo.decor(DECOR_DELETE_BY_TAG, tag=PANEL_LOG_TAG)
+        self._decorated.clear()
+
+    def _decorate_view(self):
+        """ severity icons only for messages around visible lines, rest -- on scroll
+        """
+        top = self._memo.get_prop(PROP_LINE_TOP) - LOG_PANEL_DECOR_MARGIN + self._lines_cut
+        bottom = self._memo.get_prop(PROP_LINE_BOTTOM) + LOG_PANEL_DECOR_MARGIN + self._lines_cut
+        shown,shown_lines = self._shown, self._shown_lines
+
+        start = max(self._shown_start,  bisect_right(shown_lines, top, self._shown_start) - 1)
+        end = bisect_right(shown_lines, bottom, start)
+        for i in range(start, end):
+            msg = shown[i]
+            if msg.seq not in self._decorated:
+                self._decorated.add(msg.seq)
+                self._memo.decor(DECOR_SET,  line=shown_lines[i] - self._lines_cut,
+                                    image=self._severity_ims[msg.severity],  tag=PANEL_LOG_TAG)
 
     def _reset_memo(self):
+        self._memo.decor(DECOR_DELETE_BY_TAG, tag=PANEL_LOG_TAG)
         self._memo.set_text_all('')
         self._memo_pos = (0,0)
 
+        self._shown = []
+        self._shown_lines = []
+        self._shown_start = 0
+        self._lines_cut = 0
+        self._cut_pending = 0
+        self._decorated.clear()
+
     def _set_memo_wrap(self, is_wrap):
         _wrap = WRAP_ON_WINDOW  if is_wrap else  WRAP_OFF
         self._memo.set_prop(PROP_WRAP, _wrap)
@@ -614,13 +728,17 @@ class PanelLog:
         if type_str not in self._disabled_items  and  msg.severity not in self._disabled_items:
             return True
 
-    def _get_msg_counts(self):
-        r = defaultdict(int)
-        for msg in self._msgs:
-            type_str = PanelLog.type_captions.get(msg.type, msg.type)
-            r[type_str] += 1
-            r[msg.severity] += 1
-        return r
+    def _get_group(self, msg):
+        return PanelLog.type_captions.get(msg.type, msg.type),  msg.severity
+
+    def _count_msg(self, msg, delta):
+        type_str = PanelLog.type_captions.get(msg.type, msg.type)
+        for key in (type_str, msg.severity):
+            count = self._msg_counts[key] + delta
+            if count:
+                self._msg_counts[key] = count
+            else: # no count shown
+                del self._msg_counts[key]
 
 
     def get_state(self):
@@ -631,6 +749,9 @@ class PanelLog:
         return state
 
 
+    def on_memo_scroll(self, id_dlg, id_ctl, data='', info=''):
+        self._decorate_view()
+
     def on_ed_menu(self, id_dlg, id_ctl, data='', info=''):
         # (139819628679408, 0, {'btn': 1, 'state': '', 'x': 248, 'y': 115}, '')
         h_menu = self._get_ed_menu()
@@ -643,13 +764,16 @@ class PanelLog:
 
 
     def close(self):
+        timer_proc(TIMER_STOP, self._flush, 0)
         self._reset_memo()
         self._msgs.clear()
+        self._groups.clear()
+        self._pending.clear()
 
         app_proc(PROC_BOTTOMPANEL_REMOVE, self.sidepanel_name)
         dlg_proc(self.h_dlg, DLG_FREE)
 
-        del PanelLog.panels[self.name]
+        del PanelLog.panels[(self.name, self.root)]
 
 
     @classmethod
@@ -663,7 +787,7 @@ class PanelLog:
                 else:
                     plog._disabled_items.add(info)
 
-                plog._update_sb()
+                plog._update_sb_cell_state(info)
                 plog._update_memo()
                 break
 
@@ -690,11 +814,280 @@ class PanelLog:
 
 
     @classmethod
-    def get_logger(cls, panel_name, state):
+    def get_logger(cls, panel_name, state, root=None):
         """ Main way to create panel objects
         """
-        if panel_name not in cls.panels:
-            cls.panels[panel_name] = PanelLog(panel_name, state)
+        key = (panel_name, root)
+        if key not in cls.panels:
+            cls.panels[key] = PanelLog(panel_name, state, root=root)
+
+        return cls.panels[key]
+
+
+
+class PanelProblems:
+    """ workspace problems list (ProblemsIndex) in bottom panel, next to servers' logs
+    """
+
+    sidepanel_name = 'LSP: ' + _('Problems')
+    fn_icon = PanelLog.fn_icon
+
+    MAX_SHOWN = 5000 # diagnostics listed
+    REFRESH_DELAY = 300 # ms
+
+    def __init__(self, problems, goto):
+        """ problems -- ProblemsIndex
+            goto -- callback(uri, line, column)
+        """
+        self._problems = problems
+        self._goto = goto
+
+        self._shown_version = None
+        self._line_targets = [] # memo line -> (uri, line, column)
+        self._severity_ims = {} # severity str -> icon ind in imagelist
+        self._sb_cellind_map = {} # severity str -> cellind
+        self._h_btn_sidebar = None
+
+        self._init_panel()
+
+        problems.on_change = self._schedule_refresh
+        self._refresh()
+
+    def _init_panel(self):
+        self.h_dlg = dlg_proc(0, DLG_CREATE)
+
+        n = dlg_proc(self.h_dlg, DLG_CTL_ADD, prop='editor')
+        dlg_proc(self.h_dlg, DLG_CTL_PROP_SET, index=n, prop={
+            'name':'memo',
+            'align': ALIGN_CLIENT,
+            'on_click_dbl': self._on_memo_click_dbl,
+            })
+        h_memo = dlg_proc(self.h_dlg, DLG_CTL_HANDLE, index=n)
+        self._memo = Editor(h_memo)
+
+        n = dlg_proc(self.h_dlg, DLG_CTL_ADD, prop='statusbar')
+        dlg_proc(self.h_dlg, DLG_CTL_PROP_SET, index=n, prop={
+            'name':'statusbar',
+            'align': ALIGN_TOP,
+            })
+        self._h_sb = dlg_proc(self.h_dlg, DLG_CTL_HANDLE, index=n)
+
+        self._memo.set_prop(PROP_GUTTER_ALL,    True)
+        self._memo.set_prop(PROP_GUTTER_BM,     True)
+        self._memo.set_prop(PROP_GUTTER_FOLD,   False)
+        self._memo.set_prop(PROP_GUTTER_NUM,    False)
+        self._memo.set_prop(PROP_GUTTER_STATES, False)
+
+        self._memo.set_prop(PROP_MINIMAP,           False)
+        self._memo.set_prop(PROP_MICROMAP,          False)
+        self._memo.set_prop(PROP_LAST_LINE_ON_TOP,  False)
+        self._memo.set_prop(PROP_WRAP,              WRAP_OFF)
+        self._memo.set_prop(PROP_RO,                True)
+
+        h_im = self._memo.decor(DECOR_GET_IMAGELIST)
+        for severity_str, icon_path  in SEVERITY_IC_PATHS.items():
+            self._severity_ims[severity_str] = imagelist_proc(h_im, IMAGELIST_ADD, value=icon_path)
+        statusbar_proc(self._h_sb, STATUSBAR_SET_IMAGELIST, value=h_im)
+
+        # severity counts
+        bg_color = app_proc(PROC_THEME_UI_DICT_GET, '')['TabActive']['color']
+        for name in SEVERITYS:
+            cellind = statusbar_proc(self._h_sb, STATUSBAR_ADD_CELL, index=-1)
+            self._sb_cellind_map[name] = cellind
+
+            statusbar_proc(self._h_sb, STATUSBAR_SET_CELL_IMAGEINDEX, index=cellind,
+                                                                    value=self._severity_ims[name])
+            statusbar_proc(self._h_sb, STATUSBAR_SET_CELL_HINT, index=cellind,
+                                                                    value=PANEL_CAPTIONS.get(name, 'NA'))
+            statusbar_proc(self._h_sb, STATUSBAR_SET_CELL_ALIGN, index=cellind, value='C')
+            statusbar_proc(self._h_sb, STATUSBAR_SET_CELL_AUTOSIZE, index=cellind, value=True)
+            statusbar_proc(self._h_sb, STATUSBAR_SET_CELL_COLOR_BACK, index=cellind, value=bg_color)
+
+        dlg_proc(self.h_dlg, DLG_SCALE)
+
+        app_proc(PROC_BOTTOMPANEL_ADD_DIALOG, (self.sidepanel_name,  self.h_dlg,  self.fn_icon))
+
+        for props in app_proc(PROC_BOTTOMPANEL_ENUM_ALL, ''):
+            if props['cap'] == self.sidepanel_name:
+                self._h_btn_sidebar = props['btn_h']
+                break
+
+    def show(self):
+        app_proc(PROC_BOTTOMPANEL_ACTIVATE, self.sidepanel_name)
+
+    def _schedule_refresh(self):
+        timer_proc(TIMER_START_ONE, self._refresh, self.REFRESH_DELAY)
+
+    def _refresh(self, tag='', info=''):
+        if self._shown_version == self._problems.version:
+            return
+        self._shown_version = self._problems.version
+
+        from .util import uri_to_path, collapse_path
+
+        ### counts
+        counts = self._problems.get_counts()
+        severity_counts = defaultdict(int)
+        for severity,count in enumerate(counts):
+            severity_counts[SEVERITY_MAP.get(severity, SEVERITY_NA)] += count
+
+        for name,cellind in self._sb_cellind_map.items():
+            statusbar_proc(self._h_sb, STATUSBAR_SET_CELL_OVERLAY, index=cellind,
+                                                                    value=str(severity_counts[name]))
+        if self._h_btn_sidebar:
+            button_proc(self._h_btn_sidebar, BTN_SET_OVERLAY, str(severity_counts[SEVERITY_ERR] or ''))
+
+        ### list
+        lines = []
+        self._line_targets.clear()
+        line_ims = []
+        for uri,fdiags in self._problems.get_files():
+            path = collapse_path(uri_to_path(uri))
+            for i in range(len(fdiags)):
+                if len(lines) >= self.MAX_SHOWN:
+                    break
+
+                y,x = fdiags.y0[i], fdiags.x0[i]
+                code = fdiags.codes[i]
+                code = f'[{code}] '  if code is not None else  ''
+                message = fdiags.messages[i].split('\n', 1)[0]
+                lines.append(f'{path}:{y+1}:{x+1}: {code}{message}')
+
+                self._line_targets.append((uri, y, x))
+                line_ims.append(self._severity_ims[SEVERITY_MAP.get(fdiags.severity[i], SEVERITY_NA)])
+
+        if len(self._line_targets) < len(self._problems):
+            lines.append(_('... {} more').format(len(self._problems) - len(self._line_targets)))
+
+        self._memo.set_prop(PROP_RO, False)
+        self._memo.set_text_all('\n'.join(lines))
+        self._memo.set_prop(PROP_RO, True)
+        self._memo.decor(DECOR_DELETE_BY_TAG, tag=PANEL_LOG_TAG)
+        for nline,im_ind in enumerate(line_ims):
+            self._memo.decor(DECOR_SET, line=nline, image=im_ind, tag=PANEL_LOG_TAG)
+
+    def _on_memo_click_dbl(self, id_dlg, id_ctl, data='', info=''):
+        carets = self._memo.get_carets()
+        if carets:
+            nline = carets[0][1]
+            if 0 <= nline < len(self._line_targets):
+                self._goto(*self._line_targets[nline])
+
+
+class SymbolPicker:
+    """ 'go to symbol in workspace' dialog
+        * results from local index -- on each typed char, refined by server query after typing pause
+    """
+
+    MAX_SHOWN = 100
+    QUERY_DELAY = 300 # ms, typing pause before server query
+
+    def __init__(self, search, request, goto):
+        """ search -- function(query, k), returns: list of symbols.Symbol
+            request -- function(query, callback), server query;  callback() -- when index updated
+            goto -- callback(uri, line, column)
+        """
+        self._search = search
+        self._request = request
+        self._goto = goto
+
+        self._symbols = [] # shown in listbox
+        self._init_form()
+
+    def _init_form(self):
+        self.h_dlg = dlg_proc(0, DLG_CREATE)
+        dlg_proc(self.h_dlg, DLG_PROP_SET, prop={
+                'cap': _('Workspace symbols'),
+                'w': FORM_W,
+                'h': FORM_H,
+                'border': DBORDER_SIZE,
+                'keypreview': True,
+                'on_key_down': self._on_key_down,
+                })
+
+        self._n_query = dlg_proc(self.h_dlg, DLG_CTL_ADD, 'edit')
+        dlg_proc(self.h_dlg, DLG_CTL_PROP_SET, index=self._n_query, prop={
+                'align': ALIGN_TOP,
+                'sp_a': FORM_GAP,
+                'on_change': self._on_query_change,
+                })
+
+        self._n_list = dlg_proc(self.h_dlg, DLG_CTL_ADD, 'listbox')
+        dlg_proc(self.h_dlg, DLG_CTL_PROP_SET, index=self._n_list, prop={
+                'align': ALIGN_CLIENT,
+                'sp_a': FORM_GAP,
+                'on_click_dbl': self._on_list_click_dbl,
+                })
+
+        dlg_proc(self.h_dlg, DLG_SCALE)
+
+    def show(self):
+        """ modal
+        """
+        dlg_proc(self.h_dlg, DLG_CTL_FOCUS, index=self._n_query)
+        dlg_proc(self.h_dlg, DLG_SHOW_MODAL)
+
+        timer_proc(TIMER_STOP, self._query_server, 0)
+        dlg_proc(self.h_dlg, DLG_FREE)
+        self.h_dlg = None
+
+    def _get_query(self):
+        return dlg_proc(self.h_dlg, DLG_CTL_PROP_GET, index=self._n_query)['val']
+
+    def _on_query_change(self, id_dlg, id_ctl, data='', info=''):
+        self.refresh()
+        timer_proc(TIMER_START_ONE, self._query_server, self.QUERY_DELAY)
+
+    def _query_server(self, tag='', info=''):
+        if self.h_dlg is not None:
+            query = self._get_query()
+            if query:
+                self._request(query, self.refresh)
+
+    def refresh(self):
+        """ re-search current query;  for server responses, ignored if closed
+        """
+        if self.h_dlg is None: # closed before server's response
+            return
+
+        from .util import uri_to_path, collapse_path
+
+        self._symbols = self._search(self._get_query(), self.MAX_SHOWN)
+        items = []
+        for sym in self._symbols:
+            kind = sym.kind.name.lower()  if hasattr(sym.kind, 'name') else  str(sym.kind)
+            container = f'{sym.container}.'  if sym.container else  ''
+            path = collapse_path(uri_to_path(sym.uri))
+            items.append(f'{container}{sym.name}  [{kind}]  {path}:{sym.line+1}')
+
+        dlg_proc(self.h_dlg, DLG_CTL_PROP_SET, index=self._n_list, prop={
+                'items': '\t'.join(items),
+                'val': '0'  if items else  '-1',
+                })
+
+    def _on_key_down(self, id_dlg, id_ctl, data='', info=''):
+        key = id_ctl
+        if key == VK_ENTER:
+            self._goto_selected()
+            return False
+
+        # listbox navigation without leaving query field
+        elif key in (VK_UP, VK_DOWN)  and  self._symbols:
+            sel = self._get_sel() + (-1  if key == VK_UP else  1)
+            sel = max(0, min(sel, len(self._symbols)-1))
+            dlg_proc(self.h_dlg, DLG_CTL_PROP_SET, index=self._n_list, prop={'val': str(sel)})
+            return False
+
+    def _on_list_click_dbl(self, id_dlg, id_ctl, data='', info=''):
+        self._goto_selected()
 
-        return cls.panels[panel_name]
+    def _get_sel(self):
+        val = dlg_proc(self.h_dlg, DLG_CTL_PROP_GET, index=self._n_list)['val']
+        return int(val)  if val else  -1
 
+    def _goto_selected(self):
+        sel = self._get_sel()
+        if 0 <= sel < len(self._symbols):
+            sym = self._symbols[sel]
+            dlg_proc(self.h_dlg, DLG_HIDE)
+            self._goto(sym.uri, sym.line, sym.column)
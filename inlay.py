@@ -0,0 +1,89 @@
+from cudatext import *
+
+INLAY_TAG = app_proc(PROC_GET_UNIQUE_TAG, '')
+INLAY_BLOCK_LINES = 100 # hints are requested and cached by blocks of lines
+
+
+class DocHints:
+    """ inlay hints of a single document version, by line blocks:  block index -> hints
+        * hint -- (line, column, label)
+        * on change: blocks before edit are kept;  after it -- only if lines count did not change
+    """
+    __slots__ = ('ver', 'blocks')
+
+    def __init__(self, ver):
+        self.ver = ver
+        self.blocks = {}
+
+    def __len__(self):
+        return sum(len(hints)  for hints in self.blocks.values())
+
+    def on_changes(self, changes, ver):
+        """ changes -- list of TextDocumentContentChangeEvent, from `EditorDoc.get_changes()`
+        """
+        self.ver = ver
+        for change in changes:
+            if change.range is None: # whole document
+                self.blocks.clear()
+                return
+
+            start,end = change.range.start.line,  change.range.end.line
+            line_delta = change.text.count('\n') - (end - start)
+            block0 = start // INLAY_BLOCK_LINES
+            if line_delta:
+                # lines below are shifted -- drop all following
+                self.blocks = {b:hints  for b,hints in self.blocks.items()  if b < block0}
+            else:
+                for b in range(block0, end//INLAY_BLOCK_LINES + 1):
+                    self.blocks.pop(b, None)
+
+    def get_missing(self, line0, line1):
+        """ returns: list of not cached block indexes, for lines [line0, line1]
+        """
+        return [b  for b in range(line0//INLAY_BLOCK_LINES, line1//INLAY_BLOCK_LINES + 1)
+                    if b not in self.blocks]
+
+    def set_hints(self, block0, block1, hints):
+        """ hints -- result of 'textDocument/inlayHint' for blocks [block0, block1]
+        """
+        for b in range(block0, block1+1):
+            self.blocks[b] = []
+        for hint in hints:
+            pos = hint['position']
+            b = pos['line'] // INLAY_BLOCK_LINES
+            if block0 <= b <= block1:
+                self.blocks[b].append((pos['line'], pos['character'], _get_label(hint)))
+
+    def get_hints(self, line0, line1):
+        """ returns: list of cached hints for lines [line0, line1]
+        """
+        hints = []
+        for b in range(line0//INLAY_BLOCK_LINES, line1//INLAY_BLOCK_LINES + 1):
+            hints.extend(h  for h in self.blocks.get(b, ())  if line0 <= h[0] <= line1)
+        return hints
+
+
+def render_hints(ed, hints):
+    """ CudaText has no inline virtual text -- hints' positions are marked with dotted border,
+        labels are shown in statusbar for caret's line: see `show_line_hints()`
+    """
+    ed.attr(MARKERS_DELETE_BY_TAG, tag=INLAY_TAG)
+    if not hints:
+        return
+
+    style = app_proc(PROC_THEME_SYNTAX_DICT_GET, '').get('Comment')
+    color = style['color_font']  if style else  0x808080
+    xs = [h[1]  for h in hints]
+    ys = [h[0]  for h in hints]
+    ed.attr(MARKERS_ADD_MANY,  tag=INLAY_TAG,  x=xs,  y=ys,  len=[1]*len(hints),
+                color_border=color,  border_left=BORDER_DOTTED)
+
+def show_line_hints(hints):
+    if hints:
+        msg_status('  '.join(label  for _line,_col,label in sorted(hints)))
+
+def _get_label(hint):
+    label = hint['label']
+    if isinstance(label, list): # InlayHintLabelPart[]
+        label = ''.join(part['value']  for part in label)
+    return label.strip()
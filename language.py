@@ -4,13 +4,15 @@ import socket
 import time
 import queue
 import subprocess
-from threading import Thread
+from threading import Thread, Lock
+from collections import deque
 from collections import namedtuple, defaultdict
 
 import email.parser
 import email.message
 
-from wcmatch.glob import globmatch, GLOBSTAR, BRACE
+# imported on access
+#from wcmatch.glob import translate, GLOBSTAR, BRACE
 
 from cudatext import *
 import cudax_lib as appx
@@ -20,20 +22,25 @@ _ = get_translation(__file__)  # I18N
 
 from .util import (
         get_first,
-        ed_uri,
-        get_visible_eds,
+        is_ed_visible,
         uri_to_path,
         path_to_uri,
         langid2lex,
         collapse_path,
         replace_unbracketed,
         TimerScheduler,
+        DbgCapture,
 
         ValidationError,
     )
 from .dlg import Hint
 from .dlg import PanelLog, SEVERITY_ERR
 from .book import EditorDoc
+from .diagnostics import DiagStore, estimate_size
+from .semantic import SemanticTokens, render_tokens
+from .inlay import DocHints, render_hints, show_line_hints, INLAY_BLOCK_LINES
+from .ranking import CompletionRanker
+from .symbols import SymbolIndex, from_doc_symbols, from_ws_symbols
 #from .tree import TreeMan  # imported on access
 
 ver = sys.version_info
@@ -42,22 +49,9 @@ if (ver.major, ver.minor) < (3, 7):
     sys.path.append(modules36_dir)
 
 
-from .sansio_lsp_client import client as lsp
-from .sansio_lsp_client import events
-from .sansio_lsp_client.structs import (
-        TextDocumentSyncKind,
-        Registration,
-        DiagnosticSeverity,
-        Location,
-        LocationLink,
-        DocumentSymbol,
-        CompletionItemKind,
-        MarkupKind,
-        MarkedString,
-        FormattingOptions,
-        WorkspaceFolder,
-        InsertTextFormat,
-    )
+# imported on first `Language()`: `_import_lsp()` -- pydantic models take long to build
+lsp = None # sansio_lsp_client.client
+events = None
 
 import traceback
 import datetime
@@ -71,42 +65,104 @@ IS_MAC = sys.platform=='darwin'
 CMD_OS_KEY = 'cmd_windows' if IS_WIN else ('cmd_macos' if IS_MAC else 'cmd_unix')
 
 SNIP_ID = 'cuda_lsp__snip'
+COMPLETION_MAX_SHOWN = 200 # best matching items shown in completion listbox
 
 TCP_CONNECT_TIMEOUT = 5     # sec
 MAX_FORMAT_ON_SAVE_WAIT = 1 # sec
+RESTART_DELAYS = [1, 2, 5, 10, 30] # sec, before restart of crashed server, by crash number
+RESTART_MAX = 5 # crashes within `RESTART_WINDOW` -- stop restarting
+RESTART_WINDOW = 5*60 # sec
+SEMTOK_MARGIN = 100 # lines around visible, semantic tokens rendered/requested for
+INLAY_MARGIN = 50 # lines around visible, inlay hints requested for
+STDERR_READ_SIZE = 64*1024   # bytes per read
+STDERR_MAX_LINES = 2000      # buffered, not yet logged; older are dropped
+STDERR_LINES_PER_TICK = 200  # logged per process_queues()
 MIN_TIMER_TIME = 10     # ms
 MAX_TIMER_TIME = 250    # ms
 
-GOTO_EVENT_TYPES = {
-    events.Definition,
-    events.References,
-    events.Implementation,
-    events.TypeDefinition,
-    events.Declaration,
-}
-CALLABLE_COMPLETIONS = {
-    CompletionItemKind.METHOD,
-    CompletionItemKind.FUNCTION,
-    CompletionItemKind.CONSTRUCTOR,
-    CompletionItemKind.CLASS,
-}
-
 RequestPos = namedtuple('RequestPos', 'h_ed carets target_pos_caret cursor_ed')
+# pending format-on-save;  t_start - time of on_save_pre()
+FormatSave = namedtuple('FormatSave', 'eddoc h_ed t_start t_sent deadline')
 
-GOTO_TITLES = {
-    events.Definition:      _('Go to: definition'),
-    events.References:      _('Go to: references'),
-    events.Implementation:  _('Go to: implementation'),
-    events.TypeDefinition:  _('Go to: type definition'),
-    events.Declaration:     _('Go to: declaration'),
-}
+
+def _import_lsp():
+    """ imports `sansio_lsp_client` modules, makes tables of their types;  once
+    """
+    global lsp, events, GOTO_EVENT_TYPES, GOTO_TITLES, CALLABLE_COMPLETIONS
+    global DIAG_BM_IC_PATHS, DIAG_BM_KINDS, DIAG_DEFAULT_SEVERITY
+    global TextDocumentSyncKind, Registration, DiagnosticSeverity, Location, LocationLink, \
+            DocumentSymbol, CompletionItemKind, MarkupKind, MarkupContent, MarkedString, \
+            FormattingOptions, WorkspaceFolder, InsertTextFormat, Range, Position
+    if lsp is not None:
+        return
+
+    _import_start = time.time()
+    from .sansio_lsp_client import client as lsp
+    from .sansio_lsp_client import events
+    from .sansio_lsp_client.structs import (
+            TextDocumentSyncKind,
+            Registration,
+            DiagnosticSeverity,
+            Location,
+            LocationLink,
+            DocumentSymbol,
+            CompletionItemKind,
+            MarkupKind,
+            MarkupContent,
+            MarkedString,
+            FormattingOptions,
+            WorkspaceFolder,
+            InsertTextFormat,
+            Range,
+            Position,
+        )
+    pass;       LOG and print(f'{LOG_NAME}: import time - sansio_lsp_client: {time.time()-_import_start:.3f}s')
+
+    GOTO_EVENT_TYPES = {
+        events.Definition,
+        events.References,
+        events.Implementation,
+        events.TypeDefinition,
+        events.Declaration,
+    }
+    GOTO_TITLES = {
+        events.Definition:      _('Go to: definition'),
+        events.References:      _('Go to: references'),
+        events.Implementation:  _('Go to: implementation'),
+        events.TypeDefinition:  _('Go to: type definition'),
+        events.Declaration:     _('Go to: declaration'),
+    }
+    CALLABLE_COMPLETIONS = {
+        CompletionItemKind.METHOD,
+        CompletionItemKind.FUNCTION,
+        CompletionItemKind.CONSTRUCTOR,
+        CompletionItemKind.CLASS,
+    }
+
+    DIAG_BM_IC_PATHS = {
+        DiagnosticSeverity.ERROR       : os.path.join(_icons_dir, 'error.png'),
+        DiagnosticSeverity.WARNING     : os.path.join(_icons_dir, 'warning.png'),
+        DiagnosticSeverity.INFORMATION : os.path.join(_icons_dir, 'information.png'),
+        DiagnosticSeverity.HINT        : os.path.join(_icons_dir, 'hint.png'),
+    }
+    DIAG_BM_KINDS = {
+        DiagnosticSeverity.ERROR       : 50,
+        DiagnosticSeverity.WARNING     : 51,
+        DiagnosticSeverity.INFORMATION : 52,
+        DiagnosticSeverity.HINT        : 53,
+    }
+    DIAG_DEFAULT_SEVERITY = DiagnosticSeverity.INFORMATION # *shrug*
 
 
 class Language:
-    def __init__(self, cfg, cmds=None, lintstr='', underline_style=None, state=None):
+    def __init__(self, cfg, cmds=None, lintstr='', underline_style=None, state=None, book=None,
+                                                                                    problems=None):
+        _import_lsp()
+
         self._shutting_down = None  # scheduled shutdown when not yet initialized
 
         self._cfg = cfg
+        self._book = book # DocBook -- shared with Command
         self._caret_cmds = cmds # {caption -> callable}
 
         self.langids = cfg['langids']
@@ -121,6 +177,8 @@ class Language:
         self._env_paths = cfg.get('env_paths')
         self._log_stderr = bool(cfg.get('log_stderr'))
         self._format_on_save = bool(cfg.get('format_on_save'))
+        self._semantic_tokens = bool(cfg.get('semantic_tokens'))
+        self._inlay_hints = bool(cfg.get('inlay_hints'))
 
         self._validate_config()
 
@@ -134,7 +192,9 @@ class Language:
 
 
         self._client = None
-        self.plog = PanelLog.get_logger(self.name, state=state)
+        self._start_time = None
+        self.time_to_initialized = None # seconds, from server start
+        self.plog = PanelLog.get_logger(self.name, state=state, root=self._work_dir)
         self._treeman = None
         # weakref needs a strong reference for a method-ref to work
         self._timer_callback = self.process_queues
@@ -146,19 +206,53 @@ class Language:
             )
 
         self.request_positions = {} # RequestPos
-        self.diagnostics_man = DiagnosticsMan(lintstr, underline_style)
+        self._resolve_reqs = {} # request id -> (CompletionMan, item index, editor's line count)
+        self._last_complete = None # (CompletionMan, message id, items)
+
+        self.symbols = SymbolIndex() # from 'documentSymbol' and 'workspace/symbol' results
+        self._docsym_uris = {} # request id -> (uri, callback)
+        self._wsym_reqs = {} # request id -> callback, no args
+        self.diagnostics_man = DiagnosticsMan(lintstr, underline_style, book=book, problems=problems)
         self.progresses = {} # token -> progress start message
 
         self._closed = False
         self.sock = None
         self.process = None
+        self.reader_thread = None
+        self.writer_thread = None
+        self.activity_event = None # threading.Event -- set on received data and reader exit
+
+        # crash supervision
+        self._stop_requested = False # shutdown() called, don't restart
+        self._crash_time = None # time of detected crash, until initialized again
+        self._crash_times = [] # recent, for restart limit
+        self._replay_docs = [] # EditorDoc -- to reopen on restarted server
+        self.restart_count = 0
+        self.downtime_total = 0 # sec
 
         self._read_q = queue.Queue()
         self._send_q = queue.Queue()
-        self._err_q = queue.Queue()
+        # counters of `_send_loop`
+        self._send_stats = {'flushes': 0, 'buffers': 0, 'bytes': 0, 'max_queue_depth': 0}
+        self._err_lines = deque() # stderr lines, filled by `_err_read_loop`, capped
+        self._err_dropped = 0 # lines dropped from `_err_lines`
+        self._err_lock = Lock()
+
+        self._semtoks = {} # uri -> SemanticTokens
+        self._semtok_reqs = {} # request id -> (EditorDoc, requested lines (first, last) or None)
+        self._semtok_dirty = set() # uri -- changed while request is pending
+        self._semtok_rendered = {} # ed handle -> rendered lines (first, last)
 
-        self._dbg_msgs = []
-        self._dbg_bmsgs = []
+        self._hints = {} # uri -> DocHints
+        self._hint_reqs = {} # request id -> (EditorDoc, doc version, first block, last block)
+        self._hint_rendered = {} # ed handle -> rendered lines (first, last)
+
+        self._format_saves = {} # request id -> FormatSave
+        self._format_resaving = set() # editor handles -- saving formatted doc, dont format again
+        self.format_save_timing = None # dict: phase -> seconds, of last format-on-save
+
+        self._dbg_msgs = DbgCapture(maxlen=512)
+        self._dbg_bmsgs = DbgCapture(maxlen=128)
 
         if DBG:
             self.plog.set_lex(ed.get_prop(PROP_LEXER_FILE))
@@ -170,19 +264,27 @@ class Language:
     @property
     def client(self):
         if self._client is None:
-            root_uri = path_to_uri(self._work_dir) if self._work_dir else None
-            self._client = lsp.Client(
-                root_uri=root_uri,
-                workspace_folders=self.workspace_folders,
-                process_id=os.getpid(),
-            )
+            self._client = self._new_client()
+            self._start_time = time.time()
             self._start_server()
         return self._client
 
+    def _new_client(self):
+        root_uri = path_to_uri(self._work_dir) if self._work_dir else None
+        return lsp.Client(
+            root_uri=root_uri,
+            workspace_folders=self.workspace_folders,
+            process_id=os.getpid(),
+        )
+
     @property
     def client_state_str(self):
         return (self._client.state.name).title()  if self._client is not None else  'Not started'
 
+    @property
+    def work_dir(self):
+        return self._work_dir
+
     @property
     def workspace_folders(self):
         if self._work_dir:
@@ -255,8 +357,11 @@ class Language:
             self._writer = self.process.stdin
             self._err = self.process.stderr
 
-        self.reader_thread = Thread(target=self._read_loop, name=self.name+'-reader', daemon=True)
-        self.writer_thread = Thread(target=self._send_loop, name=self.name+'-writer', daemon=True)
+        # queues and streams are passed -- threads of crashed server don't touch restarted one's
+        self.reader_thread = Thread(target=self._read_loop, args=(self._reader, self._read_q, self._send_q),
+                                                            name=self.name+'-reader', daemon=True)
+        self.writer_thread = Thread(target=self._send_loop, args=(self._writer, self._send_q),
+                                                            name=self.name+'-writer', daemon=True)
 
         self.reader_thread.start()
         self.writer_thread.start()
@@ -268,28 +373,42 @@ class Language:
         self._timer.restart()
 
     def _err_read_loop(self):
+        """ reads stderr in blocks, splits to lines here -- UI thread only takes ready lines
+        """
+        import codecs
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        tail = ''
         try:
             while self._err:
-                line = self._err.readline()
-                if line == b'':
+                data = self._err.read1(STDERR_READ_SIZE)
+                if data == b'':
                     break
-                if self._log_stderr:
-                    #print(f'ServerError: {LOG_NAME}: {self.lang_str} - {line}') # bytes
-                    try:
-                        s = line.decode('utf-8')
-                    except:
-                        s = str(line)
-                    self._err_q.put(s)
+                if not self._log_stderr:
+                    continue
+
+                lines = (tail + decoder.decode(data)).replace('\r\n', '\n').split('\n')
+                tail = lines.pop() # incomplete line
+                with self._err_lock:
+                    self._err_lines.extend(lines)
+                    overflow = len(self._err_lines) - STDERR_MAX_LINES
+                    for i in range(overflow):
+                        self._err_lines.popleft()
+                    if overflow > 0:
+                        self._err_dropped += overflow
+
+            if tail:
+                with self._err_lock:
+                    self._err_lines.append(tail)
         except Exception as ex:
             print(f'ErrReadException: {LOG_NAME}: {self.lang_str} - {ex}')
         pass;       LOG and print(f'NOTE: err reader exited')
 
 
-    def _read_loop(self):
+    def _read_loop(self, reader, read_q, send_q):
         try:
-            while self._reader:
+            while reader:
                 try:
-                    headers, header_bytes = parse_headers(self._reader)  # type: ignore
+                    headers, header_bytes = parse_headers(reader)  # type: ignore
                 except Exception as ex:
                     print(f'{LOG_NAME}: {self.lang_str} - header parse error: {ex}')
                     pass;       LOG and traceback.print_exc()
@@ -304,8 +423,10 @@ class Language:
                     break
 
                 try:
-                    body = self._reader.read(int(headers.get("Content-Length")))
-                    self._read_q.put(header_bytes + body)
+                    body = reader.read(int(headers.get("Content-Length")))
+                    read_q.put(header_bytes + body)
+                    if self.activity_event is not None:
+                        self.activity_event.set()
                 except Exception as ex:
                     print(f'BodyReadError: {LOG_NAME}: {self.lang_str} - decode error {ex}')
                     pass;       LOG and traceback.print_exc()
@@ -317,19 +438,38 @@ class Language:
             #print("ExpectedException: ? " + str(ex))
         except Exception as ex:
             print(f'ReadLoopError: {LOG_NAME}: {self.lang_str} - {ex}')
-        self._send_q.put_nowait(None) # stop send_loop()
+        send_q.put_nowait(None) # stop send_loop()
+        if self.activity_event is not None:
+            self.activity_event.set()
 
-    def _send_loop(self):
+    def _send_loop(self, writer, send_q):
         exception = None  # type: Optional[Exception]
         try:
-            while self._writer:
-                buf = self._send_q.get()
+            while writer:
+                # wait for first, then take all queued -- one write and flush
+                bufs = [send_q.get()]
+                while True:
+                    try:
+                        bufs.append(send_q.get_nowait())
+                    except queue.Empty:
+                        break
 
-                if buf is None:
-                    break
+                is_stop = None in bufs
+                if is_stop:
+                    bufs = bufs[:bufs.index(None)]
+
+                if bufs:
+                    writer.writelines(bufs)
+                    writer.flush()
+
+                    stats = self._send_stats
+                    stats['flushes'] += 1
+                    stats['buffers'] += len(bufs)
+                    stats['bytes'] += sum(map(len, bufs))
+                    stats['max_queue_depth'] = max(stats['max_queue_depth'], len(bufs))
 
-                self._writer.write(buf)
-                self._writer.flush()
+                if is_stop:
+                    break
         #except (BrokenPipeError, AttributeError):
             #pass
         except Exception as ex:
@@ -344,11 +484,15 @@ class Language:
                 self.shutdown()
                 self._shutting_down = False
 
+            if self._is_server_dead():
+                self._on_server_crash()
+                return
+
             # read Queue
             errors = []
             while not self._read_q.empty():
                 data = self._read_q.get()
-                self._dbg_bmsgs = (self._dbg_bmsgs + [data])[-128:] # dbg
+                self._dbg_bmsgs.add(data, kind='bytes', size=len(data))
 
                 events = self.client.recv(data, errors=errors)
 
@@ -367,23 +511,38 @@ class Language:
                 self._send_q.put(send_buf)
                 self._timer.restart()
 
-            # stderr Queue
-            while not self._err_q.empty():
-                s = self._err_q.get()
-                self.plog.log_str(s, type_='stderr')
+            # stderr lines, in chunks
+            if self._err_lines  or  self._err_dropped:
+                self._log_stderr_lines()
 
         except Exception as ex:
             print(f'QueuesProcessingError: {LOG_NAME}: {self.lang_str} - {ex}')
             pass;       LOG and traceback.print_exc()
 
 
+    def _log_stderr_lines(self):
+        with self._err_lock:
+            dropped = self._err_dropped
+            self._err_dropped = 0
+            n = min(len(self._err_lines), STDERR_LINES_PER_TICK)
+            lines = [self._err_lines.popleft() for i in range(n)]
+
+        if dropped:
+            self.plog.log_str(_('... {} lines dropped').format(dropped), type_='stderr')
+        if lines:
+            self.plog.log_str('\n'.join(lines), type_='stderr')
+
     def _on_lsp_msg(self, msg):
-        self._dbg_msgs = (self._dbg_msgs + [msg])[-512:]
+        self._dbg_msgs.add(msg)
 
         msgtype = type(msg)
 
         if msgtype == events.Initialized:
+            self.time_to_initialized = time.time() - self._start_time
+            pass;       LOG and print(f'{self.name}: initialized in {self.time_to_initialized:.2f}s')
             self.scfg = ServerConfig(msg, self.langids, self.lang_str)
+            if self._crash_time is not None: # restarted
+                self._on_restarted()
             app_proc(PROC_EXEC_PLUGIN, 'cuda_lsp,on_lang_inited,'+self.name)
 
         elif msgtype == events.RegisterCapabilityRequest:
@@ -392,6 +551,11 @@ class Language:
             self.process_queues()
             app_proc(PROC_EXEC_PLUGIN, 'cuda_lsp,on_lang_inited,'+self.name)
 
+        elif msgtype == events.UnregisterCapabilityRequest:
+            self.scfg.on_unregister(msg)
+            msg.reply()
+            self.process_queues()
+
         elif msgtype == events.WorkspaceFolders:
             msg.reply(folders=self.workspace_folders)
 
@@ -401,12 +565,20 @@ class Language:
             reqpos = self.request_positions.pop(msg.message_id, None)
             if items:
                 if reqpos:
-                    compl = CompletionMan(carets=reqpos.carets, h_ed=reqpos.h_ed)
+                    compl = CompletionMan(carets=reqpos.carets, h_ed=reqpos.h_ed,
+                                            is_incomplete=msg.completion_list.isIncomplete)
                     compl.show_complete(msg.message_id, items)
                     self._last_complete = (compl, msg.message_id, items)
             else:
                 msg_status(f'{LOG_NAME}: {self.lang_str}: Completion - no info')
 
+        elif msgtype == events.CompletionItemResolved:
+            req = self._resolve_reqs.pop(msg.message_id, None)
+            if req:
+                compl, item_ind, line_count = req
+                compl.resolved[item_ind] = msg.item
+                compl.apply_resolved(msg.item, line_count)
+
         elif msgtype == events.Hover:
             if msg.message_id in self.request_positions:
                 _reqpos = self.request_positions.pop(msg.message_id)
@@ -451,28 +623,41 @@ class Language:
             self.do_goto(items=msg.result, dlg_caption=dlg_caption, skip_dlg=skip_dlg, reqpos=reqpos)
 
         elif msgtype == events.MDocumentSymbols:
-            _reqpos = self.request_positions.pop(msg.message_id)
-            if ed.get_prop(PROP_HANDLE_SELF) == _reqpos.h_ed  and  self.treeman:
+            uri,callback = self._docsym_uris.pop(msg.message_id, (None, None))
+            if uri is not None:
+                self.symbols.set_file(uri, from_doc_symbols(uri, msg.result))
+            _reqpos = self.request_positions.pop(msg.message_id, None) # None -- only for `symbols`
+            if _reqpos  and  ed.get_prop(PROP_HANDLE_SELF) == _reqpos.h_ed  and  self.treeman:
                 self.treeman.fill_tree(msg.result)
+            if callback:
+                callback()
+
+        elif msgtype == events.MWorkspaceSymbols:
+            callback = self._wsym_reqs.pop(msg.message_id, None)
+            self.symbols.add(from_ws_symbols(msg.result))
+            pass;       LOG and print(f'workspace symbols: {len(msg.result or ())}, index: {self.symbols.get_stats()}')
+            if callback:
+                callback()
 
         elif msgtype == events.DocumentFormatting:
-            if msg.message_id in self.request_positions:
+            if msg.message_id in self._format_saves:
+                self.request_positions.pop(msg.message_id, None)
+                self._on_format_save_result(self._format_saves.pop(msg.message_id), msg.result)
+
+            elif msg.message_id in self.request_positions:
                 _reqpos = self.request_positions.pop(msg.message_id)
                 if ed.get_prop(PROP_HANDLE_SELF) == _reqpos.h_ed:
-                    ed.set_prop(PROP_RO, False)     # doc is set 'RO' during format-on-save
-
                     if msg.result:
-                        # need reverse order for applying
-                        # usually result are sorted by position (asc or desc) => reverse if [0] < [-1]
-                        if msg.result[0].range.start.line < msg.result[-1].range.start.line:
-                            msg.result.reverse()
-                        # sort in descending order
-                        msg.result.sort(reverse=True, key=lambda x:x.range.start)
-                        for edit in msg.result:
-                            EditorDoc.apply_edit(ed, edit)
+                        EditorDoc.apply_edits(ed, msg.result)
                     else:
                         msg_status(f'{LOG_NAME}: {self.lang_str}: Document formatting - no info')
 
+        elif msgtype == events.SemanticTokens  or  msgtype == events.SemanticTokensDelta:
+            self._on_semantic_tokens(msg)
+
+        elif msgtype == events.InlayHints:
+            self._on_inlay_hints(msg)
+
         elif msgtype == events.PublishDiagnostics:
             self.diagnostics_man.set_diagnostics(uri=msg.uri, diag_list=msg.diagnostics)
 
@@ -491,6 +676,11 @@ class Language:
 
         elif msgtype == events.ResponseError:
             _reqpos = self.request_positions.pop(msg.message_id, None)    # discard
+            self._semtok_reqs.pop(msg.message_id, None)
+            self._hint_reqs.pop(msg.message_id, None)
+            self._resolve_reqs.pop(msg.message_id, None)
+            self._docsym_uris.pop(msg.message_id, None)
+            self._wsym_reqs.pop(msg.message_id, None)
             errstr = f'ResponseError[{msg.code}]: {msg.message}'
             self.plog.log_str(errstr, type_=_('Response Error'), severity=SEVERITY_ERR)
 
@@ -530,11 +720,32 @@ class Language:
 
         _verdoc = eddoc.get_verdoc()
         self.client.did_change(text_document=_verdoc, content_changes=_changes)
+        self.request_semantic_tokens(eddoc)
+        dochints = self._hints.get(eddoc.uri)
+        if dochints is not None:
+            dochints.on_changes(_changes, eddoc.ver)
+            self._hint_rendered.pop(eddoc.h_ed, None)
+            self.request_inlay_hints(eddoc)
         self._timer.restart()
 
 
     def on_ed_shown(self, eddoc):
         self.diagnostics_man.on_doc_shown(eddoc)
+        if eddoc.uri in self._semtoks:
+            self._render_semantic_tokens(eddoc)
+        self.request_inlay_hints(eddoc)
+
+    def on_scroll(self, eddoc):
+        self.diagnostics_man.on_scroll(eddoc)
+        self.request_inlay_hints(eddoc)
+
+        rendered = self._semtok_rendered.get(eddoc.h_ed)
+        if rendered is not None:
+            line0,line1 = _get_visible_lines(eddoc.ed, margin=0)
+            if line0 < rendered[0]  or  line1 > rendered[1]: # scrolled out of rendered
+                self._render_semantic_tokens(eddoc)
+                if self._semtok_range_mode(eddoc):
+                    self.request_semantic_tokens(eddoc)
 
     def on_open(self, eddoc):
         if self.client.is_initialized:
@@ -544,10 +755,18 @@ class Language:
                 eddoc.on_open(lang=self)
                 doc = eddoc.get_textdoc()
                 self.client.did_open(doc)
+                self.request_semantic_tokens(eddoc)
+                self.request_inlay_hints(eddoc)
                 return True
 
 
     def on_close(self, eddoc):
+        self.diagnostics_man.on_doc_closed(eddoc)
+        self._semtoks.pop(eddoc.uri, None)
+        self._semtok_rendered.pop(eddoc.h_ed, None)
+        self._hints.pop(eddoc.uri, None)
+        self._hint_rendered.pop(eddoc.h_ed, None)
+
         if self.client.is_initialized:
             opts = self.scfg.method_opts(METHOD_DID_CLOSE, eddoc)
             if opts is not None  and  eddoc.lang is not None: # lang check -- is opened
@@ -574,26 +793,71 @@ class Language:
                 self.client.did_save(text_document=docid, text=text)
 
     def on_save_pre(self, eddoc):
+        """ format-on-save without blocking: document is saved as is, formatting is requested,
+                and when it comes - applied and document is saved again
+        """
         if not self._format_on_save:
             return
 
+        h_ed = eddoc.ed.get_prop(PROP_HANDLE_SELF)
+        if h_ed in self._format_resaving: # saving formatted
+            return
+        if any(fsave.h_ed == h_ed  for fsave in self._format_saves.values()):
+            return
+
+        t_start = time.time()
         req_id = self.request_format_doc(eddoc)
         if req_id is not None:
-            end_time = time.time() + MAX_FORMAT_ON_SAVE_WAIT
+            self.process_queues()
             eddoc.ed.set_prop(PROP_RO, True)    # prevent document editing between request and formattng
+
+            t_sent = time.time()
+            deadline = t_sent + MAX_FORMAT_ON_SAVE_WAIT
+            self._format_saves[req_id] = FormatSave(eddoc, h_ed, t_start, t_sent, deadline)
+            timer_proc(TIMER_START, self._format_save_timer, 100)
+
+    def _on_format_save_result(self, fsave, edits):
+        t_response = time.time()
+
+        edt = fsave.eddoc.ed
+        if edt.get_prop(PROP_TAB_TITLE) is None: # editor closed
+            return
+        edt.set_prop(PROP_RO, False)
+
+        if edits  and  EditorDoc.apply_edits(edt, edits):
+            t_applied = time.time()
+            self._format_resaving.add(fsave.h_ed)
             try:
-                while time.time() < end_time:
-                    if req_id in self.request_positions:
-                        app_idle(wait=True)
-                    else:
-                        break
-                else:
-                    msg_status(_('{}: {} - No format-on-save response came').format(
-                                                                        LOG_NAME, self.lang_str))
+                edt.save()
             finally:
+                self._format_resaving.discard(fsave.h_ed)
+        else:
+            t_applied = time.time()
+
+        self.format_save_timing = {
+            'request':  fsave.t_sent - fsave.t_start,
+            'response': t_response - fsave.t_sent,
+            'apply':    t_applied - t_response,
+            'save':     time.time() - t_applied,
+        }
+        pass;       LOG and print(f'{LOG_NAME}: {self.lang_str} - format-on-save timing: {self.format_save_timing}')
+
+    def _format_save_timer(self, tag='', info=''):
+        """ stops waiting for format-on-save responses after `MAX_FORMAT_ON_SAVE_WAIT`
+        """
+        now = time.time()
+        for req_id,fsave in list(self._format_saves.items()):
+            if now > fsave.deadline:
+                del self._format_saves[req_id]
+                self.request_positions.pop(req_id, None) # ignore late response
                 # check if editor closed before resetting 'RO'
-                if eddoc.ed.get_prop(PROP_TAB_TITLE) is not None:
-                    eddoc.ed.set_prop(PROP_RO, False)
+                if fsave.eddoc.ed.get_prop(PROP_TAB_TITLE) is not None:
+                    fsave.eddoc.ed.set_prop(PROP_RO, False)
+                msg_status(_('{}: {} - No format-on-save response came').format(
+                                                                        LOG_NAME, self.lang_str))
+
+        if not self._format_saves:
+            timer_proc(TIMER_STOP, self._format_save_timer, 0)
 
     def on_rootdir_change(self, newroot):
         if self._client is not None  and  self.client.is_initialized:
@@ -635,15 +899,43 @@ class Language:
 
 
     def on_complete(self, eddoc):
+        # typed more of the same word -- re-rank previous list, if it was complete
+        if self._last_complete:
+            compl, message_id, items = self._last_complete
+            if compl.rerank(message_id, items):
+                return True
+
         id, pos = self._action_by_name(METHOD_COMPLETION, eddoc)
         if id is not None:
             self._save_req_pos(id=id)
             return True
 
     def on_snippet(self, ed_self, snippet_id, snippet_text): # completion callback
-        if snippet_id == SNIP_ID:
+        if snippet_id == SNIP_ID  and  self._last_complete:
             compl, message_id, items = self._last_complete
-            compl.do_complete(message_id, snippet_text, items)
+            item_ind = compl.do_complete(message_id, snippet_text, items)
+            if item_ind is not None  and  items[item_ind].additionalTextEdits is None:
+                self._resolve_completion(ed_self, compl, items[item_ind], item_ind)
+
+    def _resolve_completion(self, ed_self, compl, item, item_ind):
+        """ lazy 'completionItem/resolve' of accepted item:  documentation, additional edits (imports)
+        """
+        eddoc = self._book.get_doc(ed_self)
+        if eddoc is None  or  eddoc.lang is not self:
+            return
+        opts = self.scfg.method_opts(METHOD_COMPLETION, eddoc)
+        if not opts  or  not opts.get('resolveProvider'):
+            return
+
+        line_count = ed_self.get_line_count()
+        resolved = compl.resolved.get(item_ind)
+        if resolved is not None:
+            compl.apply_resolved(resolved, line_count)
+            return
+
+        id = self.client.completion_item_resolve(item)
+        self._resolve_reqs[id] = (compl, item_ind, line_count)
+        self.process_queues()
 
 
     def on_hover(self, eddoc, caret):
@@ -721,6 +1013,127 @@ class Language:
             ed.set_caret(*target_caret) # goto specified position start
             ed.set_prop(PROP_LINE_TOP, target_line)
 
+    def _semtok_range_mode(self, eddoc):
+        opts = self.scfg.method_opts(METHOD_SEMANTIC_TOKENS, eddoc)
+        return bool(opts  and  not opts.get('full')  and  opts.get('range'))
+
+    def request_semantic_tokens(self, eddoc):
+        """ full document: delta from previous result if server supports, otherwise -- visible range
+            * one request per document at a time: deltas must apply to the result they are based on
+        """
+        if not self._semantic_tokens  or  not self.client.is_initialized:
+            return
+        opts = self.scfg.method_opts(METHOD_SEMANTIC_TOKENS, eddoc)
+        if opts is None:
+            return
+        if any(doc is eddoc  for doc,_lines in self._semtok_reqs.values()):
+            self._semtok_dirty.add(eddoc.uri)
+            return
+
+        docid = eddoc.get_docid()
+        full = opts.get('full')
+        stoks = self._semtoks.get(eddoc.uri)
+        lines = None
+        if full:
+            if isinstance(full, dict)  and  full.get('delta')  and  stoks  and  stoks.result_id:
+                id = self.client.semantic_tokens_full_delta(docid, previous_result_id=stoks.result_id)
+            else:
+                id = self.client.semantic_tokens_full(docid)
+        elif opts.get('range'):
+            lines = _get_visible_lines(eddoc.ed, margin=SEMTOK_MARGIN)
+            range_ = Range(start=Position(line=lines[0], character=0),
+                            end=Position(line=lines[1]+1, character=0))
+            id = self.client.semantic_tokens_range(docid, range_)
+        else:
+            return
+        self._semtok_reqs[id] = (eddoc, lines)
+        self._timer.restart()
+
+    def _on_semantic_tokens(self, msg):
+        eddoc,lines = self._semtok_reqs.pop(msg.message_id, (None,None))
+        if eddoc is None  or  self._book.get_doc(uri=eddoc.uri) is not eddoc: # closed
+            return
+
+        result = msg.result
+        if result is not None:
+            if 'edits' in result:
+                stoks = self._semtoks.get(eddoc.uri)
+                if stoks is not None:
+                    stoks.apply_edits(result['edits'], result.get('resultId'))
+            else:
+                self._semtoks[eddoc.uri] = SemanticTokens(result.get('data', ()), result.get('resultId'))
+            pass;       LOG and print(f'semantic tokens: {eddoc.uri}: {len(self._semtoks.get(eddoc.uri) or ())}')
+
+        if eddoc.uri in self._semtok_dirty:
+            self._semtok_dirty.discard(eddoc.uri)
+            self.request_semantic_tokens(eddoc)
+        self._render_semantic_tokens(eddoc)
+
+    def _render_semantic_tokens(self, eddoc):
+        """ only visible lines, plus margin
+        """
+        stoks = self._semtoks.get(eddoc.uri)
+        opts = self.scfg.method_opts(METHOD_SEMANTIC_TOKENS, eddoc)
+        if stoks is None  or  not opts  or  not is_ed_visible(eddoc.ed):
+            return
+
+        line0,line1 = _get_visible_lines(eddoc.ed, margin=SEMTOK_MARGIN)
+        tokens = stoks.get_tokens(line0, line1+1)
+        render_tokens(eddoc.ed, tokens, opts.get('legend', {}))
+        self._semtok_rendered[eddoc.h_ed] = (line0, line1)
+
+    def request_inlay_hints(self, eddoc):
+        """ requests not cached blocks of visible lines, plus margin
+            * one request per document at a time
+        """
+        if not self._inlay_hints  or  not self.client.is_initialized  or  not is_ed_visible(eddoc.ed):
+            return
+        if self.scfg.method_opts(METHOD_INLAY_HINT, eddoc) is None:
+            return
+
+        dochints = self._hints.get(eddoc.uri)
+        if dochints is None  or  dochints.ver != eddoc.ver:
+            dochints = self._hints[eddoc.uri] = DocHints(eddoc.ver)
+            self._hint_rendered.pop(eddoc.h_ed, None)
+
+        line0,line1 = _get_visible_lines(eddoc.ed, margin=INLAY_MARGIN)
+        missing = dochints.get_missing(line0, line1)
+        if not missing:
+            rendered = self._hint_rendered.get(eddoc.h_ed)
+            vis0,vis1 = _get_visible_lines(eddoc.ed, margin=0)
+            if rendered is None  or  vis0 < rendered[0]  or  vis1 > rendered[1]:
+                render_hints(eddoc.ed, dochints.get_hints(line0, line1))
+                self._hint_rendered[eddoc.h_ed] = (line0, line1)
+            return
+        if any(doc is eddoc  for doc,*_ in self._hint_reqs.values()): # will re-check on response
+            return
+
+        block0,block1 = missing[0], missing[-1]
+        range_ = Range(start=Position(line=block0*INLAY_BLOCK_LINES, character=0),
+                        end=Position(line=(block1+1)*INLAY_BLOCK_LINES, character=0))
+        id = self.client.inlay_hints(eddoc.get_docid(), range_)
+        self._hint_reqs[id] = (eddoc, eddoc.ver, block0, block1)
+        self._timer.restart()
+
+    def _on_inlay_hints(self, msg):
+        eddoc,ver,block0,block1 = self._hint_reqs.pop(msg.message_id, (None,)*4)
+        if eddoc is None  or  self._book.get_doc(uri=eddoc.uri) is not eddoc: # closed
+            return
+
+        dochints = self._hints.get(eddoc.uri)
+        if dochints is not None  and  dochints.ver == ver: # otherwise - stale, document changed
+            dochints.set_hints(block0, block1, msg.result or ())
+            self._hint_rendered.pop(eddoc.h_ed, None)
+            pass;       LOG and print(f'inlay hints: {eddoc.uri}: blocks {block0}-{block1}: {len(dochints)}')
+
+        self.request_inlay_hints(eddoc) # renders, or requests remaining blocks
+
+    def on_caret_slow(self, eddoc):
+        dochints = self._hints.get(eddoc.uri)
+        if dochints is not None  and  dochints.ver == eddoc.ver:
+            y = eddoc.ed.get_carets()[0][1]
+            show_line_hints(dochints.get_hints(y, y))
+
     def request_sighelp(self, eddoc):
         id, pos = self._action_by_name(METHOD_SIG_HELP, eddoc)
         if id is not None:
@@ -789,11 +1202,26 @@ class Language:
 
                 docid = eddoc.get_docid()
                 id = self.client.doc_symbol(docid)
+                self._docsym_uris[id] = (eddoc.uri, None)
 
                 self._save_req_pos(id=id, target_pos_caret=None) # save current editor handle
                 self.process_queues()
                 return True
 
+    def request_doc_symbols(self, eddoc, callback=None):
+        """ only for `symbols` index, tree is not changed;  `callback()` -- when index updated
+            returns: True if request was sent
+        """
+        if not self.client.is_initialized  or  eddoc.lang is None:
+            return False
+        if self.scfg.method_opts(METHOD_DOC_SYMBOLS, eddoc) is None:
+            return False
+        self.send_changes(eddoc)
+        id = self.client.doc_symbol(eddoc.get_docid())
+        self._docsym_uris[id] = (eddoc.uri, callback)
+        self.process_queues()
+        return True
+
     def call_hierarchy_in(self, eddoc):
         self.send_changes(eddoc)
 
@@ -801,9 +1229,50 @@ class Language:
         id = self.client.call_hierarchy_in(docpos)
 
 
-    def workspace_symbol(self, eddoc):
-        self.client.workspace_symbol(query='')
+    def request_workspace_symbols(self, query, callback=None):
+        """ results are added to `symbols` index, then `callback()` is called
+            returns: True if request was sent
+        """
+        if not self.client.is_initialized  or  self.scfg.method_opts(METHOD_WS_SYMBOLS) is None:
+            return False
+        # only newest query matters;  `==` -- bound methods are new objects on each access
+        for id in [id for id,cb in self._wsym_reqs.items()  if callback is not None  and  cb == callback]:
+            self._wsym_reqs[id] = None
+        id = self.client.workspace_symbol(query=query)
+        self._wsym_reqs[id] = callback
+        self.process_queues()
+        return True
+
 
+    def get_stats(self):
+        """ debug info: timings, counters
+        """
+        return {
+            'state': self.client_state_str,
+            'time_to_initialized': self.time_to_initialized,
+            'restarts': self.restart_count,
+            'downtime_total': self.downtime_total,
+            'format_save_timing': self.format_save_timing,
+            'diagnostics': self.diagnostics_man.store.get_stats(),
+            'send': self._get_send_stats(),
+            'semantic_tokens': {
+                'docs': len(self._semtoks),
+                'tokens': sum(len(stoks) for stoks in self._semtoks.values()),
+            },
+            'symbols': self.symbols.get_stats(),
+            'inlay_hints': {
+                'docs': len(self._hints),
+                'blocks': sum(len(dochints.blocks) for dochints in self._hints.values()),
+                'hints': sum(len(dochints) for dochints in self._hints.values()),
+            },
+        }
+
+    def _get_send_stats(self):
+        stats = dict(self._send_stats)
+        flushes = stats['flushes']
+        stats['bytes_per_flush'] = stats['bytes'] // flushes  if flushes else  0
+        stats['queue_depth'] = self._send_q.qsize()
+        return stats
 
     def get_state_pair(self):
         key = self.name
@@ -813,13 +1282,35 @@ class Language:
 
     def shutdown(self, *args, **vargs):
         pass;       LOG and print('-- lang - shutting down')
-        if self.client.is_initialized:
+        self._stop_requested = True
+        if self._client is not None  and  self.is_stopped(): # crashed, failed to start -- no response will come
+            self.exit()
+        elif self.client.is_initialized:
             self.client.shutdown()
         else:
             self._shutting_down = True
 
+    def is_stopped(self):
+        """ server process is gone (or was never started)
+        """
+        return self.reader_thread is None  or  not self.reader_thread.is_alive()
+
+    def terminate(self, kill=False):
+        """ for servers not exiting on request
+        """
+        if self.process  and  self.process.poll() is None:
+            pass;       LOG and print(f'-- {"killing" if kill else "terminating"}: {self.name}')
+            if kill:
+                self.process.kill()
+            else:
+                self.process.terminate()
+        elif self.sock:
+            self.sock.close()
+            self.sock = None
+
     def exit(self):
         if not self._closed:
+            self.diagnostics_man.clear()
             self._send_q.put_nowait(None) # stop send_loop()
             self.process_queues()
 
@@ -828,7 +1319,104 @@ class Language:
 
             self._closed = True
             self._timer.stop()
+            timer_proc(TIMER_STOP, self._format_save_timer, 0)
+            timer_proc(TIMER_STOP, self._restart_server, 0)
+
+
+    def _is_server_dead(self):
+        """ server exited (reader got EOF) while not asked to
+        """
+        if self._closed  or  self._stop_requested  or  self._client is None \
+                or  self._crash_time is not None:
+            return False
+        if self.reader_thread is None  or  self.reader_thread.is_alive()  or  not self._read_q.empty():
+            return False
+        return self._client.state in (lsp.ClientState.NOT_INITIALIZED,
+                                            lsp.ClientState.WAITING_FOR_INITIALIZED,
+                                            lsp.ClientState.NORMAL)
+
+    def _on_server_crash(self):
+        now = time.time()
+        self._crash_time = now
+        self._crash_times = [t for t in self._crash_times  if now - t < RESTART_WINDOW] + [now]
+
+        exitcode = self.process.poll()  if self.process else  None
+        print('NOTE: ' + _('{}: {} - server stopped unexpectedly, exit code: {}').format(
+                LOG_NAME, self.lang_str, exitcode))
+
+        # detach documents, reopen them after restart
+        for doc in self._book.get_docs():
+            if doc.lang is self:
+                doc.on_close()
+                self._replay_docs.append(doc)
+        self.diagnostics_man.clear()
+        for fsave in self._format_saves.values():
+            # tab could be closed while waiting
+            if self._book.get_doc(uri=fsave.eddoc.uri) is fsave.eddoc:
+                fsave.eddoc.ed.set_prop(PROP_RO, False)
+        self._format_saves.clear()
+        timer_proc(TIMER_STOP, self._format_save_timer, 0)
+        self.request_positions.clear()
+        self.progresses.clear()
+        self._semtoks.clear()
+        self._semtok_reqs.clear()
+        self._semtok_dirty.clear()
+        self._semtok_rendered.clear()
+        self._hints.clear()
+        self._hint_reqs.clear()
+        self._hint_rendered.clear()
+        self._docsym_uris.clear()
+        self._wsym_reqs.clear()
+        # not initialized until restarted -- no didOpen or requests to dead server meanwhile
+        self._client = self._new_client()
+
+        if len(self._crash_times) > RESTART_MAX:
+            print('NOTE: ' + _('{}: {} - server crashed {} times in {} minutes, not restarting').format(
+                    LOG_NAME, self.lang_str, len(self._crash_times), RESTART_WINDOW//60))
+            self._timer.stop()
+            return
 
+        delay = RESTART_DELAYS[min(len(self._crash_times), len(RESTART_DELAYS)) - 1]
+        pass;       LOG and print(f'{self.name}: restarting in {delay}s')
+        timer_proc(TIMER_START_ONE, self._restart_server, delay*1000)
+
+    def _restart_server(self, tag='', info=''):
+        if self._closed  or  self._stop_requested:
+            return
+
+        # old writer has own queue -- stops on its own, no waiting here
+        self._send_q.put_nowait(None)
+        if self.process  and  self.process.poll() is None:
+            self.process.kill()
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+        self._read_q = queue.Queue()
+        self._send_q = queue.Queue()
+        self._client = None
+        self.restart_count += 1
+
+        self.client # starts server
+        self._timer.restart()
+
+    def _on_restarted(self):
+        downtime = time.time() - self._crash_time
+        self.downtime_total += downtime
+        self._crash_time = None
+        print(_('{}: {} - server restarted, down for {:.1f}s').format(LOG_NAME, self.lang_str, downtime))
+
+        # replay didOpen from documents' shadow text -- later didChange is a diff from it
+        replay_docs,self._replay_docs = self._replay_docs,[]
+        # + any still marked as opened by this server -- were not sent to restarted one
+        replay_docs += [doc for doc in self._book.get_docs()  if doc.lang is self  and  doc not in replay_docs]
+        for doc in replay_docs:
+            if self._book.get_doc(uri=doc.uri) is not doc: # closed meanwhile
+                continue
+            if doc.lang is self:
+                doc.on_close()
+            if doc.lang is None:
+                self.on_open(doc)
 
     def _on_progress(self, msg):
         if isinstance(msg, events.WorkDoneProgressCreate):
@@ -890,6 +1478,13 @@ class Language:
         print('*** registrations: ', pprint.pformat(self.scfg.capabs))
 
 
+def _get_visible_lines(ed, margin):
+    """ returns: (first, last) line indexes of editor's visible range, extended by `margin`
+    """
+    line_top = ed.get_prop(PROP_LINE_TOP)
+    line_bottom = ed.get_prop(PROP_LINE_BOTTOM)
+    return max(0, line_top - margin),  line_bottom + margin
+
 def _connect_tcp(port):
     start_time = time.time()
     while time.time() - start_time < TCP_CONNECT_TIMEOUT:
@@ -902,19 +1497,11 @@ def _connect_tcp(port):
 
 DIAG_BM_TAG = app_proc(PROC_GET_UNIQUE_TAG, '') # jic
 _icons_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'icons')
-DIAG_BM_IC_PATHS = {
-    DiagnosticSeverity.ERROR       : os.path.join(_icons_dir, 'error.png'),
-    DiagnosticSeverity.WARNING     : os.path.join(_icons_dir, 'warning.png'),
-    DiagnosticSeverity.INFORMATION : os.path.join(_icons_dir, 'information.png'),
-    DiagnosticSeverity.HINT        : os.path.join(_icons_dir, 'hint.png'),
-}
-DIAG_BM_KINDS = {
-    DiagnosticSeverity.ERROR       : 50,
-    DiagnosticSeverity.WARNING     : 51,
-    DiagnosticSeverity.INFORMATION : 52,
-    DiagnosticSeverity.HINT        : 53,
-}
-DIAG_DEFAULT_SEVERITY = DiagnosticSeverity.INFORMATION # *shrug*
+# DIAG_BM_IC_PATHS, DIAG_BM_KINDS, DIAG_DEFAULT_SEVERITY -- made by `_import_lsp()`
+# files with more diagnostics are rendered only around viewport, in blocks of lines
+DIAG_VIEWPORT_MIN_COUNT = 1000
+DIAG_BLOCK_LINES = 200
+DIAG_VIEWPORT_MARGIN = 100 # lines
 
 class DiagnosticsMan:
     """ * Command.on_tab_change() ->
@@ -929,9 +1516,12 @@ class DiagnosticsMan:
     LINT_BOOKMARK = 101
     LINT_DECOR = 102
 
-    def __init__(self, lintstr=None, underline_style=2):
-        self.uri_diags = {} # uri -> diag?
+    def __init__(self, lintstr=None, underline_style=2, book=None, problems=None):
+        self._book = book # DocBook -- uri -> doc lookup
+        self._problems = problems # ProblemsIndex -- workspace-wide, shared by servers
+        self.store = DiagStore() # uri -> FileDiags
         self.dirtys = set() # uri
+        self._rendered = {} # ed handle -> (FileDiags, set of rendered blocks) -- viewport rendering
 
         self._linttype = None  # gutter icons
         self._highlight_bg = False
@@ -953,91 +1543,168 @@ class DiagnosticsMan:
         if eddoc.uri in self.dirtys:
             self.dirtys.remove(eddoc.uri)
 
-            self._apply_diagnostics(eddoc.ed, self.uri_diags[eddoc.uri])
+            self._apply_diagnostics(eddoc.ed, self.store.get(eddoc.uri))
+
+    def on_doc_closed(self, eddoc):
+        """ only rendered state is dropped -- workspace-wide servers don't republish closed files;
+            diagnostics are removed on empty publish or shutdown
+        """
+        self._rendered.pop(eddoc.h_ed, None)
+        # render again, if reopened
+        if eddoc.uri in self.store:
+            self.dirtys.add(eddoc.uri)
+        else:
+            self.dirtys.discard(eddoc.uri)
+
+    def clear(self):
+        """ on server shutdown -- remove own diagnostics from problems
+        """
+        if self._problems is not None:
+            for uri in self.store.get_uris():
+                self._problems.update(uri, None, owner=self)
+        self.store = DiagStore()
+        self.dirtys.clear()
+        self._rendered.clear()
+
+    def detach_problems(self):
+        """ parked server -- own diagnostics are kept, but not in workspace problems
+        """
+        if self._problems is not None:
+            for uri in self.store.get_uris():
+                self._problems.update(uri, None, owner=self)
+        self._problems = None
+
+    def attach_problems(self, problems):
+        self._problems = problems
+        for uri in self.store.get_uris():
+            problems.update(uri, self.store.get(uri), owner=self)
 
     def set_diagnostics(self, uri, diag_list):
-        if not self._linttype:
-            return
-        if len(diag_list) > 0  or  self.uri_diags.get(uri):
-            self.uri_diags[uri] = diag_list
-            for ed in get_visible_eds():
-                if uri == ed_uri(ed):
-                    self._apply_diagnostics(ed, diag_list)
+        if len(diag_list) > 0  or  uri in self.store:
+            fdiags = self.store.set(uri, diag_list)
+            pass;       LOG and fdiags and print(f'diagnostics stored: {uri}: {len(fdiags)} items, '
+                                f'{fdiags.get_size()} bytes (was {estimate_size(diag_list)})')
+            if self._problems is not None:
+                self._problems.update(uri, fdiags, owner=self)
+
+            if not self._linttype:
+                return
+            doc = self._book.get_doc(uri=uri)
+            if doc  and  is_ed_visible(doc.ed):
+                self._apply_diagnostics(doc.ed, fdiags)
             else: # not visible, update when visible
                 self.dirtys.add(uri)
 
-    def _apply_diagnostics(self, ed, diag_list):
+    def on_scroll(self, eddoc):
+        """ viewport rendering: fill blocks scrolled into view
+        """
+        rendered = self._rendered.get(eddoc.h_ed)
+        if rendered is not None:
+            fdiags,blocks = rendered
+            self._render_viewport(eddoc.ed, fdiags, blocks)
+
+    def _apply_diagnostics(self, ed, fdiags):
+        """ fdiags -- FileDiags or None
+            * many diagnostics -- only blocks of lines around viewport are rendered, rest on scroll
+        """
         if self._linttype  or  self._highlight_bg:
             self._clear_old(ed)
 
+            h_ed = ed.get_prop(PROP_HANDLE_SELF)
+            if fdiags  and  len(fdiags) > DIAG_VIEWPORT_MIN_COUNT:
+                blocks = set() # rendered blocks' indexes
+                self._rendered[h_ed] = (fdiags, blocks)
+                self._render_viewport(ed, fdiags, blocks)
+            else:
+                self._rendered.pop(h_ed, None)
+                diag_list = fdiags.get_diags()  if fdiags else  []
+                self._render(ed, diag_list)
+
+    def _render_viewport(self, ed, fdiags, blocks):
+        """ renders not yet rendered blocks of `DIAG_BLOCK_LINES` lines in view, plus margin
+        """
+        line_top = max(0, ed.get_prop(PROP_LINE_TOP) - DIAG_VIEWPORT_MARGIN)
+        line_bottom = ed.get_prop(PROP_LINE_BOTTOM) + DIAG_VIEWPORT_MARGIN
+
+        for block in range(line_top//DIAG_BLOCK_LINES,  line_bottom//DIAG_BLOCK_LINES + 1):
+            if block not in blocks:
+                blocks.add(block)
+                start,end = fdiags.line_range(block*DIAG_BLOCK_LINES,  (block+1)*DIAG_BLOCK_LINES)
+                if start < end:
+                    pass;       LOG and print(f'diagnostics: rendering block {block}: {end-start} items')
+                    self._render(ed, fdiags.get_diags(start, end))
+
+    def _render(self, ed, diag_list):
+        """ adds gutter icons and underlines, without clearing
+        """
+        if self._linttype == DiagnosticsMan.LINT_DECOR:
+            h_ed = ed.get_prop(PROP_HANDLE_SELF)
+            if h_ed not in self._decor_serverity_ims:
+                self._setup_decor_gutter(ed)
+            decor_im_map = self._decor_serverity_ims[h_ed]
+
+        ### set new
+        # get dict of lines for gutter
+        line_diags = self._get_gutter_data(diag_list)
+
+        err_ranges = []  # tuple(x,y,len)
+        # apply gutter to editor
+        for nline,diags in line_diags.items():
+            severity_la = lambda d: d.severity or 9
             if self._linttype == DiagnosticsMan.LINT_DECOR:
-                h_ed = ed.get_prop(PROP_HANDLE_SELF)
-                if h_ed not in self._decor_serverity_ims:
-                    self._setup_decor_gutter(ed)
-                decor_im_map = self._decor_serverity_ims[h_ed]
-
-            ### set new
-            # get dict of lines for gutter
-            line_diags = self._get_gutter_data(diag_list)
-
-            err_ranges = []  # tuple(x,y,len)
-            # apply gutter to editor
-            for nline,diags in line_diags.items():
-                severity_la = lambda d: d.severity or 9
-                if self._linttype == DiagnosticsMan.LINT_DECOR:
-                    decor_severity = min(severity_la(d) for d in diags) # most severe severity  for decor
-                else:
-                    diags.sort(key=severity_la) # important first, None - last
-
-                # get msg-lines for bookmark hover
-                msg_lines = []
-                for d in diags:
-                    kind = DIAG_BM_KINDS.get(d.severity, DIAG_DEFAULT_SEVERITY)
-                    #TODO fix ugly... (.severity and .code -- can be None)
-                    pre,post = ('[',']: ') if (d.severity is not None  or  d.code) else  ('','')
-                    mid = ':' if (d.severity is not None  and  d.code) else ''
-
-                    severity_short = d.severity.short_name() if d.severity else ''
-                    # "[severity:code] message"
-                    code = str(d.code)  if d.code is not None else  ''
-                    text = ''.join([pre, severity_short, mid, code, post, d.message])
-                    msg_lines.append(text)
-
-                # gather err ranges
-                for d in diags:
-                    x0,y0 = d.range.start.character, d.range.start.line
-                    x1,y1 = d.range.end.character, d.range.end.line
-                    if y0 == y1:   # single line (shortcut for common case)
-                        err_ranges.append((x0, y0, x1-x0))
-                    else: # multiline
-                        for linen in range(y0, y1):
-                            linelen = len(ed.get_text_line(linen))
-                            mx0 = x0  if linen == y0 else  0
-                            mx1 = linelen
-                            err_ranges.append((mx0, y0, mx1-mx0))
-
-                        err_ranges.append((0, y1, x1)) # last line
-
-
-                # set bookmark or decor
-                if self._linttype == DiagnosticsMan.LINT_DECOR:
-                    if decor_severity == 9:
-                        decor_severity = DIAG_DEFAULT_SEVERITY
-                    ed.decor(DECOR_SET, line=nline, image=decor_im_map[decor_severity])
-                else:
-                    text = '\n'.join(msg_lines)
-                    ed.bookmark(BOOKMARK_SET, nline=nline, nkind=kind, text=text, tag=DIAG_BM_TAG)
-            #end for line_diags
+                decor_severity = min(severity_la(d) for d in diags) # most severe severity  for decor
+            else:
+                diags.sort(key=severity_la) # important first, None - last
+
+            # get msg-lines for bookmark hover
+            msg_lines = []
+            for d in diags:
+                kind = DIAG_BM_KINDS.get(d.severity, DIAG_DEFAULT_SEVERITY)
+                #TODO fix ugly... (.severity and .code -- can be None)
+                pre,post = ('[',']: ') if (d.severity is not None  or  d.code) else  ('','')
+                mid = ':' if (d.severity is not None  and  d.code) else ''
+
+                severity_short = d.severity.short_name() if d.severity else ''
+                # "[severity:code] message"
+                code = str(d.code)  if d.code is not None else  ''
+                text = ''.join([pre, severity_short, mid, code, post, d.message])
+                msg_lines.append(text)
+
+            # gather err ranges
+            for d in diags:
+                x0,y0 = d.range.start.character, d.range.start.line
+                x1,y1 = d.range.end.character, d.range.end.line
+                if y0 == y1:   # single line (shortcut for common case)
+                    err_ranges.append((x0, y0, x1-x0))
+                else: # multiline
+                    for linen in range(y0, y1):
+                        linelen = len(ed.get_text_line(linen) or '')
+                        mx0 = x0  if linen == y0 else  0
+                        mx1 = linelen
+                        err_ranges.append((mx0, linen, mx1-mx0))
+
+                    err_ranges.append((0, y1, x1)) # last line
+
+
+            # set bookmark or decor
+            if self._linttype == DiagnosticsMan.LINT_DECOR:
+                if decor_severity == 9:
+                    decor_severity = DIAG_DEFAULT_SEVERITY
+                ed.decor(DECOR_SET, line=nline, image=decor_im_map[decor_severity])
+            else:
+                text = '\n'.join(msg_lines)
+                ed.bookmark(BOOKMARK_SET, nline=nline, nkind=kind, text=text, tag=DIAG_BM_TAG)
+        #end for line_diags
 
-            # underline error text ranges
-            if self._highlight_text  and  err_ranges:
-                _colors = app_proc(PROC_THEME_UI_DICT_GET, '')
-                err_col = _colors['EdMicromapSpell']['color']
-                xs,ys,lens = list(zip(*err_ranges))
-                self.last_err_ranges = err_ranges
+        # underline error text ranges
+        if self._highlight_text  and  err_ranges:
+            _colors = app_proc(PROC_THEME_UI_DICT_GET, '')
+            err_col = _colors['EdMicromapSpell']['color']
+            xs,ys,lens = list(zip(*err_ranges))
+            self.last_err_ranges = err_ranges
 
-                ed.attr(MARKERS_ADD_MANY,  tag=DIAG_BM_TAG,  x=xs,  y=ys,  len=lens,
-                            color_border=err_col,  border_down=self._underline_style)
+            ed.attr(MARKERS_ADD_MANY,  tag=DIAG_BM_TAG,  x=xs,  y=ys,  len=lens,
+                        color_border=err_col,  border_down=self._underline_style)
 
 
     def _get_gutter_data(self, diag_list):
@@ -1103,6 +1770,10 @@ METHOD_TYPEDEF          = 'textDocument/typeDefinition'
 METHOD_DOC_SYMBOLS      = 'textDocument/documentSymbol'
 METHOD_FORMAT_DOC       = 'textDocument/formatting'
 METHOD_FORMAT_SEL       = 'textDocument/rangeFormatting'
+METHOD_SEMANTIC_TOKENS  = 'textDocument/semanticTokens'
+METHOD_INLAY_HINT       = 'textDocument/inlayHint'
+
+METHOD_WS_SYMBOLS       = 'workspace/symbol'
 
 # client method(s)
 METHOD_WS_FOLDERS = 'workspace/workspaceFolders'
@@ -1137,8 +1808,9 @@ METHOD_PROVIDERS = {
     METHOD_DOC_SYMBOLS      : 'documentSymbolProvider',
     METHOD_FORMAT_DOC       : 'documentFormattingProvider',
     METHOD_FORMAT_SEL       : 'documentRangeFormattingProvider',
-
-    #METHOD_WS_SYMBOLS       : '',
+    METHOD_SEMANTIC_TOKENS  : 'semanticTokensProvider',
+    METHOD_INLAY_HINT       : 'inlayHintProvider',
+    METHOD_WS_SYMBOLS       : 'workspaceSymbolProvider',
 }
 
 # not started by user - dont print "unsupported"
@@ -1150,12 +1822,36 @@ AUTO_METHODS = {
 
     METHOD_COMPLETION,
     METHOD_SIG_HELP,
+    METHOD_SEMANTIC_TOKENS,
+    METHOD_INLAY_HINT,
 }
 
+_glob_matchers = {} # documentSelector pattern -> compiled matcher
+
+def get_glob_matcher(pattern):
+    """ returns: callable(filename) -> bool;  compiled once per pattern
+    """
+    matcher = _glob_matchers.get(pattern)
+    if matcher is None:
+        import re
+        from wcmatch import glob as wcglob
+
+        includes, excludes = wcglob.translate(pattern, flags=wcglob.GLOBSTAR | wcglob.BRACE)
+        includes = [re.compile(p) for p in includes]
+        excludes = [re.compile(p) for p in excludes]
+
+        def matcher(filename): #SKIP
+            return any(p.match(filename) for p in includes) \
+                        and not any(p.match(filename) for p in excludes)
+
+        _glob_matchers[pattern] = matcher
+    return matcher
+
+
 class ServerConfig:
     def __init__(self, initialized, langids, lang_str):
         capabilities = initialized.capabilities
-        self.capabs = [] # struct.Registration
+        capabs = [] # struct.Registration
         self.lang_str = lang_str
 
         _default_selector = [{'language': langid}  for langid in langids]
@@ -1175,13 +1871,13 @@ class ServerConfig:
                 _opts = {**_default_opts}
                 if isinstance(_save, dict):
                     _opts.update(_save)
-                self.capabs.append(Registration(id='0', method=METHOD_DID_SAVE, registerOptions=_opts))
+                capabs.append(Registration(id='0', method=METHOD_DID_SAVE, registerOptions=_opts))
 
         #  OPEN, CLOSE
         if is_openclose:
             open = Registration(id='0', method=METHOD_DID_OPEN, registerOptions=_default_opts)
             close = Registration(id='0', method=METHOD_DID_CLOSE, registerOptions=_default_opts)
-            self.capabs += [open, close]
+            capabs += [open, close]
 
         # CHANGE
         if isinstance(docsync, dict):
@@ -1191,7 +1887,7 @@ class ServerConfig:
             docsynckind = TextDocumentSyncKind(docsync)
 
         _opts = {**_default_opts, 'syncKind': docsynckind}
-        self.capabs.append(Registration(id='0', method=METHOD_DID_CHANGE, registerOptions=_opts))
+        capabs.append(Registration(id='0', method=METHOD_DID_CHANGE, registerOptions=_opts))
 
 
         ### WORKSPACE
@@ -1205,7 +1901,7 @@ class ServerConfig:
                 'changeNotifications': wsfolders.get('changeNotifications', False),
             }
             _reg = Registration(id='0', method=METHOD_WS_FOLDERS, registerOptions=_opts)
-            self.capabs.append(_reg)
+            capabs.append(_reg)
 
 
         ### ~other static capabilites
@@ -1217,12 +1913,44 @@ class ServerConfig:
             _opts = {**_default_opts}
             if isinstance(capval, dict):
                 _opts.update(capval)
-            self.capabs.append(Registration(id='0', method=meth, registerOptions=_opts))
+            capabs.append(Registration(id='0', method=meth, registerOptions=_opts))
+
+        # registry:  (id, method) -> Registration;  static registrations have id '0'
+        self._regs = {(reg.id, reg.method):reg  for reg in capabs}
+        self._update_index()
+
+    @property
+    def capabs(self):
+        return list(self._regs.values())
 
     def on_register(self, dynreg):
-        """ process dynamic registration request: RegisterMethodRequest
+        """ process dynamic registration request: RegisterCapabilityRequest
+            * same id - replaces previous registration
+        """
+        for reg in dynreg.registrations:
+            self._regs[(reg.id, reg.method)] = reg
+        self._update_index()
+
+    def on_unregister(self, dynunreg):
+        """ process dynamic unregistration request: UnregisterCapabilityRequest
         """
-        self.capabs.extend(dynreg.registrations)
+        for unreg in dynunreg.unregisterations:
+            self._regs.pop((unreg.id, unreg.method), None)
+        self._update_index()
+
+    def _update_index(self):
+        """ rebuild method -> registrations index, drop matching results
+            * registrations with same method and options are indexed once
+                (servers re-register on config change)
+        """
+        self._method_regs = defaultdict(list) # method -> list of Registration
+        for registration in self._regs.values():
+            method_regs = self._method_regs[registration.method]
+            if any(reg.registerOptions == registration.registerOptions  for reg in method_regs):
+                continue
+            method_regs.append(registration)
+
+        self._opts_cache = {} # (method, filename, langid) -> options or None
 
 
     def method_opts(self, method_name, doc=None, ed_self=None, langid=None):
@@ -1234,25 +1962,33 @@ class ServerConfig:
             if langid is None:
                 langid = doc.langid
 
-            for registration in self.capabs:
-                if registration.method == method_name:
-                    if ServerConfig.match_capability(registration, ed_self, langid):
-                        return registration.registerOptions
+            filename = ed_self.get_filename() or ''
+            key = (method_name, filename, langid)
+            try:
+                opts = self._opts_cache[key]
+            except KeyError:
+                opts = None
+                for registration in self._method_regs.get(method_name, ()):
+                    if ServerConfig.match_capability(registration, filename, langid):
+                        opts = registration.registerOptions
+                        break
+                self._opts_cache[key] = opts
 
-            if method_name not in AUTO_METHODS:
+            if opts is None  and  method_name not in AUTO_METHODS:
                 print(f'NOTE: {LOG_NAME}: {self.lang_str} - unsupported method: {method_name}')
+            return opts
 
         elif method_name.startswith('workspace/'):
-            for registration in self.capabs:
-                if registration.method == method_name:
-                    return registration.registerOptions
+            regs = self._method_regs.get(method_name)
+            if regs:
+                return regs[0].registerOptions
 
         elif LOG:
             print(f'NOTE: {LOG_NAME}: odd method: {method_name}')
 
 
     # "selector is one ore more filters"
-    def match_capability(registration, ed_self, langid):
+    def match_capability(registration, filename, langid):
 
         filters = registration.registerOptions.get('documentSelector', [])
         # allowing empty selector on workspace methods  (ok?)
@@ -1260,9 +1996,9 @@ class ServerConfig:
         if not filters:
             return (registration.method or '').startswith('workspace/')
 
-        return any(ServerConfig.filter_doc_matcher(f, ed_self, langid)  for f in filters)
+        return any(ServerConfig.filter_doc_matcher(f, filename, langid)  for f in filters)
 
-    def filter_doc_matcher(f, ed_self, langid):
+    def filter_doc_matcher(f, filename, langid):
         language = f.get('language')
         if language is not None  and  language != langid:
             return False
@@ -1271,7 +2007,7 @@ class ServerConfig:
 
         pattern = f.get('pattern')
         if pattern is not None:
-            if not globmatch(ed_self.get_filename() or "", pattern, flags=GLOBSTAR | BRACE):
+            if not get_glob_matcher(pattern)(filename):
                 return False
 
         # checking because C# gives empty selector: just by scheme -- scheme is ignored
@@ -1315,12 +2051,17 @@ class ServerConfig:
 
 
 class CompletionMan:
-    def __init__(self, carets=None, h_ed=None):
+    def __init__(self, carets=None, h_ed=None, is_incomplete=False):
         assert len(carets) == 1, 'no autocomplete for multi-carets'
         assert carets[0][3] == -1, 'no autocomplete for selection'
 
         self.carets = carets
         self.h_ed = h_ed or ed.get_prop(PROP_HANDLE_SELF)
+        self.is_incomplete = is_incomplete # server's list is not final -- can't re-rank locally
+        self.resolved = {} # item index -> resolved CompletionItem
+        self._ranker = None
+        self._word_start = None # (x, y) of typed word, when list was shown
+        self._line_head = None # line's text before `_word_start`
 
     def show_complete(self, message_id, items):
 
@@ -1334,18 +2075,51 @@ class CompletionMan:
         if lex is None: return
         #if not is_lexer_allowed(lex): return
 
-        words = ['{}\t{}\t{}|{}'.format(item.label, item.kind and item.kind.name.lower() or '', message_id, i)
-                    for i,item in enumerate(items)]
+        x0,y0 = carets[0][:2]
+        self._load_nonwords(lex)
+        word = self._get_word(x0, y0)
+        prefix = word[0]  if word else  ''
+        self._word_start = (x0 - len(prefix), y0)
+        self._line_head = ed.get_text_line(y0)[:x0 - len(prefix)]
+
+        if self._ranker is None:
+            self._ranker = CompletionRanker(items)
+        # only best `COMPLETION_MAX_SHOWN`: listbox lags on huge lists
+        inds = self._ranker.rank(prefix, COMPLETION_MAX_SHOWN)
+        pass;       LOG and print(f'completion: {prefix!r}: showing {len(inds)} of {len(items)}')
 
-        # results are already seem to be sorted by .sortText
+        words = ['{}\t{}\t{}|{}'.format(items[i].label, items[i].kind and items[i].kind.name.lower() or '', message_id, i)
+                    for i in inds]
 
-        sel = get_first(i for i,item in enumerate(items)  if item.preselect is True)
+        sel = get_first(n for n,i in enumerate(inds)  if items[i].preselect is True)
         sel = sel or 0
 
         ed.complete_alt('\n'.join(words), SNIP_ID, len_chars=0, selected=sel)
 
+    def rerank(self, message_id, items):
+        """ shows re-ranked `items` if caret is still in the same word, after unchanged line start
+            returns: True if shown
+        """
+        if self.is_incomplete  or  self._word_start is None:       return False
+        if self.h_ed != ed.get_prop(PROP_HANDLE_SELF):       return False
+
+        carets = ed.get_carets()
+        if len(carets) != 1  or  carets[0][3] != -1:        return False
+        x0,y0 = carets[0][:2]
+        word = self._get_word(x0, y0)
+        if not word  or  (x0 - len(word[0]), y0) != self._word_start:
+            return False
+        if ed.get_text_line(y0)[:self._word_start[0]] != self._line_head: # 'a.fo' -> 'b.fo'
+            return False
+
+        self.carets = carets
+        self.show_complete(message_id, items)
+        return True
+
     #TODO add () and move caret if function?
     def do_complete(self, message_id, snippet_text, items):
+        """ returns: index of applied item, or None
+        """
         items_msg_id, item_ind = snippet_text.split('|')
         item_ind = int(item_ind)
 
@@ -1358,17 +2132,16 @@ class CompletionMan:
         if item.textEdit:
             x1,y1,x2,y2 = EditorDoc.range2carets(item.textEdit.range)
             text = item.textEdit.newText
+            # list was re-ranked after more typing: range ends at caret of request -- extend to current
+            caret_x,caret_y = ed.get_carets()[0][:2]
+            if caret_y == y2  and  caret_x > x2:
+                x2 = caret_x
         else: # no textEdit, just using .label
             _carets = ed.get_carets()
             x0,y0, _x1,_y1 = _carets[0]
 
             lex = ed.get_prop(PROP_LEXER_FILE, '')
-            self._nonwords = appx.get_opt(
-                'nonword_chars',
-                '''-+*=/\()[]{}<>"'.,:;~?!@#$%^&|`…''',
-                appx.CONFIG_LEV_ALL,
-                ed,
-                lex)
+            self._load_nonwords(lex)
 
             word = self._get_word(x0, y0)
 
@@ -1400,9 +2173,37 @@ class CompletionMan:
 
         # additinal edits
         if item.additionalTextEdits:
-            for edit in item.additionalTextEdits:
-                EditorDoc.apply_edit(ed, edit)
+            EditorDoc.apply_edits(ed, item.additionalTextEdits)
 
+        return item_ind
+
+    def apply_resolved(self, item, line_count):
+        """ additional edits and info of resolved item
+            * edits are skipped if lines were added or removed since item was accepted -- positions are stale
+        """
+        if self.h_ed != ed.get_prop(PROP_HANDLE_SELF):       return # wrong editor
+
+        if item.additionalTextEdits:
+            if ed.get_line_count() == line_count:
+                EditorDoc.apply_edits(ed, item.additionalTextEdits)
+            else:
+                msg_status(f'{LOG_NAME}: ' + _('Document changed, additional edits of completion skipped'))
+
+        doc = item.documentation
+        if isinstance(doc, MarkupContent):
+            doc = doc.value
+        info = item.detail  or  (doc and doc.strip().split('\n', 1)[0])
+        if info:
+            msg_status(f'{item.label}: {info}')
+
+
+    def _load_nonwords(self, lex):
+        self._nonwords = appx.get_opt(
+            'nonword_chars',
+            '''-+*=/\()[]{}<>"'.,:;~?!@#$%^&|`…''',
+            appx.CONFIG_LEV_ALL,
+            ed,
+            lex)
 
     def _get_word(self, x, y):
         if not 0<=y<ed.get_line_count():
@@ -1,5 +1,6 @@
 import os
 import time
+from collections import OrderedDict
 
 import sys
 _plugin_dir = os.path.dirname(os.path.realpath(__file__))
@@ -21,6 +22,7 @@ from .util import (
         command, # hides hint
         get_visible_eds,
         collapse_path,
+        DbgCapture,
 
         ValidationError,
     )
@@ -41,7 +43,13 @@ fn_opt_descr    = os.path.join(_plugin_dir,  'readme', 'options_description.md')
 fn_state        = os.path.join(dir_settings, 'cuda_lsp_state.json')
 
 SEVERS_SHUTDOWN_MAX_TIME = 2 # seconds
-SEVERS_SHUTDOWN_CHECK_PERIOD = 0.1 # seconds
+SEVERS_TERMINATE_WAIT = 0.5 # seconds, after terminate() before kill()
+OPEN_QUEUE_BATCH = 2 # editors 'on_open'-ed per timer tick
+OPEN_QUEUE_PERIOD = 50 # ms
+SERVER_POOL_MAX = 3 # servers kept running for previous project folders
+SERVER_POOL_IDLE_TIME = 15*60 # seconds, unused pooled server is shut down after
+SERVER_POOL_CHECK_PERIOD = 60*1000 # ms
+PREWARM_DELAY = 3000 # ms, after session load
 LINT_STYLE_MAP = {0:1, 1:4, 2: 2, 3:6}
 
 STATE = {} # like log-panel's filter state
@@ -65,6 +73,7 @@ opt_tree_types_show = ''
 
 # to close - change lexer (then back)
 opt_manual_didopen = None # debug help "manual_didopen"
+opt_prewarm_servers = [] # server names or langids, started after session load
 
 """
 file:///install.inf
@@ -102,7 +111,6 @@ https://microsoft.github.io/language-server-protocol/specifications/specificatio
 * () on functions completion?
 * 'hover' dialog -- add  context menu - apply any lexer
 * separate log panel for server's `LogMessage`
-* unregistering capabilities
 
 
 #TODO features
@@ -185,8 +193,14 @@ class Command:
         self.is_loading_sesh = False
         # editors not on_open'ed durisg sesh-load;  on_open visibles when sesh loaded
         self._sesh_eds = []
+        # editors waiting for throttled _do_on_open() -- after session load, server init
+        self._open_q = []
         self._langs = {} # langid -> Language
+        # servers of previous project folders -- LRU, (server name, root dir) -> (Language, park time)
+        self._pool = OrderedDict()
         self._book = None
+        self._problems = None
+        self._problems_panel = None
         self._project_dir = None
 
         self._load_config()
@@ -219,6 +233,14 @@ class Command:
             self._book = DocBook()
         return self._book
 
+    @property
+    def problems(self):
+        if self._problems is None:
+            from .diagnostics import ProblemsIndex
+
+            self._problems = ProblemsIndex()
+        return self._problems
+
     def config(self):
         self._save_config()
         file_open((fn_config, fn_opt_descr))
@@ -304,6 +326,45 @@ class Command:
                 if lang.tree_enabled:
                     lang.update_tree(doc)
 
+    def _queue_open(self, eds):
+        """ throttled _do_on_open(): active editor right away, others -
+                in batches of `OPEN_QUEUE_BATCH` on timer ticks
+        """
+        h_active = ed.get_prop(PROP_HANDLE_SELF)
+        queued = {edt.get_prop(PROP_HANDLE_SELF) for edt in self._open_q}
+        for edt in eds:
+            h_ed = edt.get_prop(PROP_HANDLE_SELF)
+            if h_ed in queued:
+                continue
+            queued.add(h_ed)
+
+            if h_ed == h_active:
+                self._open_q.insert(0, edt)
+            else:
+                self._open_q.append(edt)
+
+        if self._open_q:
+            self._open_queue_tick()
+
+    def _unqueue_open(self, ed_self):
+        h_ed = ed_self.get_prop(PROP_HANDLE_SELF)
+        self._open_q = [edt for edt in self._open_q  if edt.get_prop(PROP_HANDLE_SELF) != h_ed]
+
+    def _open_queue_tick(self, tag='', info=''):
+        batch = self._open_q[:OPEN_QUEUE_BATCH]
+        del self._open_q[:OPEN_QUEUE_BATCH]
+
+        for edt in batch:
+            # closed while waiting
+            if edt.get_prop(PROP_TAB_TITLE) is None:
+                continue
+            self.on_open(edt)
+
+        if self._open_q:
+            timer_proc(TIMER_START_ONE, self._open_queue_tick, OPEN_QUEUE_PERIOD)
+        else:
+            timer_proc(TIMER_STOP, self._open_queue_tick, 0)
+
     def on_focus(self, ed_self):
         doc = self.book.get_doc(ed_self)
         if doc and doc.lang and doc.lang.tree_enabled:
@@ -321,6 +382,7 @@ class Command:
                 pass;       LOG and print(f'* uri change: {doc.uri} => {newuri}')
                 if doc.lang:
                     doc.lang.on_close(doc)
+                self.book.on_rename(ed_self)
                 self.on_open(ed_self)
             elif doc.lang: # just saved to same file
                 doc.lang.on_save(doc)
@@ -340,6 +402,7 @@ class Command:
             if doc.lang:
                 doc.lang.on_close(doc)
             self.book.on_close(ed_self) # deletes doc
+        self._unqueue_open(ed_self)
 
     #NOTE: also gets called when document first activated
     def on_lexer(self, ed_self):
@@ -400,6 +463,16 @@ class Command:
     def on_goto_def(self, ed_self):
         self.call_definition(ed_self)
 
+    def on_scroll(self, ed_self):
+        doc = self.book.get_doc(ed_self)
+        if doc  and  doc.lang:
+            doc.lang.on_scroll(doc)
+
+    def on_caret_slow(self, ed_self):
+        doc = self.book.get_doc(ed_self)
+        if doc  and  doc.lang:
+            doc.lang.on_caret_slow(doc)
+
     def on_tab_change(self, ed_self):
         doc = self.book.get_doc(ed_self)
         if doc  and  doc.lang:
@@ -416,9 +489,9 @@ class Command:
         """
         for lang in self._langs.values():
             if lang.name == name:
-                for doc in self.book.get_docs():
-                    if doc.lang is None  and  is_ed_visible(doc.ed):
-                        self.on_open(doc.ed)
+                eds = [doc.ed for doc in self.book.get_docs()
+                                    if doc.lang is None  and  is_ed_visible(doc.ed)]
+                self._queue_open(eds)
                 break # found initted lang
 
     def on_state(self, ed_self, state):
@@ -430,8 +503,10 @@ class Command:
             # on_open for delayed
             eds = self._sesh_eds[:]
             self._sesh_eds.clear()
-            for editor in eds:
-                self._do_on_open(editor)
+            self._queue_open(eds)
+
+            if opt_prewarm_servers:
+                timer_proc(TIMER_START_ONE, self._prewarm_servers, PREWARM_DELAY)
 
         elif state == APPSTATE_PROJECT:
             new_project_dir = get_project_dir()
@@ -440,9 +515,11 @@ class Command:
                 print(f'{LOG_NAME}: project root folder changed: {_collapsed_path}; notifying servers...')
 
                 for name,lang in list(self._langs.items()):
+                    if name not in self._langs: # parked via other langid
+                        continue
                     handled = lang.on_rootdir_change(new_project_dir)
                     if not handled:
-                        self.shutdown_server(name=name)
+                        self._park_server(lang)
 
                 # on_open visible eds/docs without lang
                 for edt in get_visible_eds():
@@ -476,20 +553,44 @@ class Command:
                 pass
 
 
-        # start servers shutdown
-        for langid,lang in self._langs.items():
-            lang.shutdown()
+        # pooled servers too
+        for key,(lang,_park_time) in self._pool.items():
+            self._langs[key] = lang
+        self._pool.clear()
 
-        _start = time.time()
-        while self._langs:
-            time.sleep(SEVERS_SHUTDOWN_CHECK_PERIOD)
-            for key,lang in list(self._langs.items()):
-                lang.process_queues()
-                if lang.is_client_exited():
-                    del self._langs[key]
+        # start servers shutdown, all at once
+        from threading import Event
 
-            if time.time() - _start > SEVERS_SHUTDOWN_MAX_TIME:
-                break
+        activity = Event() # set by servers' readers: data received, pipe closed
+        langs = set(self._langs.values())
+        for lang in langs:
+            lang.activity_event = activity
+            lang.shutdown()
+            lang.process_queues()
+
+        def wait_stopped(langs, timeout): #SKIP
+            """ returns: servers still running after `timeout`
+            """
+            deadline = time.time() + timeout
+            while langs:
+                langs = {lang for lang in langs  if not lang.is_stopped()}
+                remaining = deadline - time.time()
+                if not langs  or  remaining <= 0:
+                    break
+                activity.wait(remaining)
+                activity.clear()
+                for lang in langs:
+                    lang.process_queues() # handle 'shutdown' response: sends 'exit'
+            return langs
+
+        langs = wait_stopped(langs, SEVERS_SHUTDOWN_MAX_TIME)
+        if langs:
+            for lang in langs:
+                lang.terminate()
+            langs = wait_stopped(langs, SEVERS_TERMINATE_WAIT)
+            for lang in langs:
+                lang.terminate(kill=True)
+        self._langs.clear()
 
         try:
             os.waitpid(-1, os.WNOHANG) # -1 -- any child
@@ -513,35 +614,67 @@ class Command:
             # no server exists for this langid, try to create
             for cfg in servers_cfgs:
                 if langid in cfg.get('langids', []):
-                    from copy import deepcopy
-                    from .language import Language
+                    # server for this folder is still running
+                    lang = self._unpark_server(cfg['name'], get_project_dir())
+                    if lang is None:
+                        lang = self._create_lang(cfg)
+                        pass;       LOG and print(f'*** Created lang({lang.name}) for {ed_self, langid}')
+                    break
+
+        return self._langs.get(langid)
 
-                    cfg = deepcopy(cfg)
+    def _create_lang(self, cfg):
+        """ creates Language for server config, registers it to all its langids
+        """
+        from copy import deepcopy
+        from .language import Language
 
-                    # update server 'settings' with project's lsp server settings
-                    proj_lsp_cfg = get_project_lsp_cfg()
-                    cfg.setdefault('settings', {}).update(proj_lsp_cfg or {})
+        _cfg = cfg
+        cfg = deepcopy(cfg)
 
-                    self._project_dir = get_project_dir()
-                    cfg['work_dir'] = self._project_dir
+        # update server 'settings' with project's lsp server settings
+        proj_lsp_cfg = get_project_lsp_cfg()
+        cfg.setdefault('settings', {}).update(proj_lsp_cfg or {})
 
-                    try:
-                        lang = Language(cfg,
-                                cmds=self._hint_cmds,
-                                lintstr=opt_lint_type,
-                                underline_style=LINT_STYLE_MAP[opt_lint_underline_style],
-                                state=STATE.get(cfg.get('name'))
-                        )
-                    except ValidationError:
-                        servers_cfgs.remove(cfg) # dont nag on every on_open
-                        raise
-                    pass;       LOG and print(f'*** Created lang({lang.name}) for {ed_self, langid}')
-                    # register server to all its supported langids
-                    for server_langid in lang.langids:
-                        self._langs[server_langid] = lang
-                    break
+        self._project_dir = get_project_dir()
+        cfg['work_dir'] = self._project_dir
 
-        return self._langs.get(langid)
+        try:
+            lang = Language(cfg,
+                    cmds=self._hint_cmds,
+                    lintstr=opt_lint_type,
+                    underline_style=LINT_STYLE_MAP[opt_lint_underline_style],
+                    state=STATE.get(cfg.get('name')),
+                    book=self.book,
+                    problems=self.problems,
+            )
+        except ValidationError:
+            servers_cfgs.remove(_cfg) # dont nag on every on_open
+            raise
+        # register server to all its supported langids
+        for server_langid in lang.langids:
+            self._langs[server_langid] = lang
+        return lang
+
+    def _prewarm_servers(self, tag='', info=''):
+        """ starts servers from option "prewarm_servers" in background, before documents need them
+        """
+        global json
+        import json
+
+        running = {lang.name for lang in self._langs.values()}
+        for cfg in list(servers_cfgs):
+            if cfg['name'] in running:
+                continue
+            if cfg['name'] in opt_prewarm_servers \
+                    or  any(langid in opt_prewarm_servers  for langid in cfg.get('langids', [])):
+                pass;       LOG and print(f'*** Prewarming server: {cfg["name"]}')
+                try:
+                    lang = self._create_lang(cfg)
+                except ValidationError:
+                    continue
+                lang.client # starts server process and initialization
+                running.add(lang.name)
 
     @command
     def call_hover(self, ed_self=None, caret=None):
@@ -603,10 +736,20 @@ class Command:
             doc.lang.call_hierarchy_in(doc)
 
 
-    def dbg_workspace_symbols(self):
+    def workspace_symbols(self):
         doc = self.book.get_doc(ed)
-        if doc and doc.lang:
-            doc.lang.workspace_symbol(doc)
+        if not doc  or  not doc.lang:
+            msg_status(_('No LSP server for current document'))
+            return
+
+        from .dlg import SymbolPicker
+
+        lang = doc.lang
+        picker = SymbolPicker(search=lang.symbols.search,  request=lang.request_workspace_symbols,
+                                goto=self._goto_uri_pos)
+        if doc.uri not in lang.symbols: # current document's symbols -- to search before typing pause
+            lang.request_doc_symbols(doc, callback=picker.refresh)
+        picker.show()
 
 
     def dbg_show_msg(self, show_bytes=False):
@@ -617,22 +760,105 @@ class Command:
             msg_status(_('No messages for server of current document'))
             return
 
-        names = ['msg|' + str(msg)[:SERVER_RESPONSE_DIALOG_LEN]+'...\t'+type(msg).__name__
-                        for msg in lang._dbg_msgs]
+        capture = lang._dbg_bmsgs  if show_bytes else  lang._dbg_msgs
+        records = capture.get_records()
+        if not records:
+            msg_status(_('No messages captured, capture mode: ') + DbgCapture.mode)
+            return
+
+        def record_name(rec):
+            _time = time.strftime('%H:%M:%S', time.localtime(rec.time))
+            _text = str(rec.obj)[:SERVER_RESPONSE_DIALOG_LEN]+'...'  if rec.obj is not None else  ''
+            _size = f' ({rec.size})'  if rec.size is not None else  ''
+            return f'msg|{_time} {_text}\t{rec.kind}{_size}'
+
+        names = [record_name(rec) for rec in records]
         ind = dlg_menu(DMENU_LIST, names)
 
         if ind is not None:
+            obj = records[ind].obj
+            if obj is None:
+                msg_status(_('Message payload not captured, enable full capture: "Debug: messages capture mode..."'))
+                return
             max_output_width = max(80, ed.get_prop(PROP_SCROLL_HORZ_INFO)['page'])
             if ed.get_filename():
                 file_open('')
             import pprint
+            if isinstance(obj, (bytes, bytearray)):
+                ed.set_text_all(obj.decode('utf-8', errors='replace'))
+                return
             try:
-                ed.set_text_all(pprint.pformat(lang._dbg_msgs[ind].dict(), width=max_output_width))
+                ed.set_text_all(pprint.pformat(obj.dict(), width=max_output_width))
             except:
-                j = {k:str(v) for k,v in lang._dbg_msgs[ind].dict().items()}
+                j = {k:str(v) for k,v in obj.dict().items()}
                 ed.set_text_all(pprint.pformat(j, width=max_output_width))
             ed.set_prop(PROP_LEXER_FILE, 'Python')
 
+    def dbg_capture_mode(self):
+        modes = DbgCapture.MODES
+        names = [_('Off'), _('Metadata only (kind, size, time)'), _('Full messages')]
+        names = [name + ('\t*'  if mode == DbgCapture.mode else  '')  for name,mode in zip(names, modes)]
+        ind = dlg_menu(DMENU_LIST, names, focused=modes.index(DbgCapture.mode),
+                                                            caption=_('Debug messages capture'))
+        if ind is not None:
+            DbgCapture.set_mode(modes[ind])
+            if modes[ind] == DbgCapture.MODE_OFF:
+                for lang in self._langs.values():
+                    lang._dbg_msgs.clear()
+                    lang._dbg_bmsgs.clear()
+
+    def dbg_show_stats(self):
+        if not self._langs:
+            msg_status(_('No servers started'))
+            return
+
+        import pprint
+
+        stats = {}
+        for lang in self._langs.values():
+            stats[lang.name] = lang.get_stats()
+
+        file_open('')
+        ed.set_text_all(pprint.pformat(stats))
+        ed.set_prop(PROP_LEXER_FILE, 'Python')
+
+    def show_problems(self):
+        if self._problems_panel is None:
+            from .dlg import PanelProblems
+
+            self._problems_panel = PanelProblems(self.problems, goto=self._goto_uri_pos)
+        self._problems_panel.show()
+
+    def goto_next_error(self):
+        self._goto_error(self.problems.next_error)
+
+    def goto_prev_error(self):
+        self._goto_error(self.problems.prev_error)
+
+    def _goto_error(self, find_f):
+        x,y = ed.get_carets()[0][:2]
+        target = find_f(ed_uri(ed), y, x)
+        if target is None:
+            msg_status(_('No errors'))
+            return
+        self._goto_uri_pos(*target)
+
+    def _goto_uri_pos(self, uri, line, column):
+        from .util import uri_to_path
+
+        path = uri_to_path(uri)
+        if ed_uri(ed) != uri:
+            if not os.path.isfile(path):
+                msg_status(_('File does not exist: ') + path)
+                return
+            file_open(path)
+            app_idle(True) # fixes editor not scrolled to caret
+        ed.set_caret(column, line)
+        top = ed.get_prop(PROP_LINE_TOP)
+        bottom = ed.get_prop(PROP_LINE_BOTTOM)
+        if not top <= line <= bottom:
+            ed.set_prop(PROP_LINE_TOP, max(0, line-3))
+
     def dbg_show_docs(self):
         items = [f'{doc.lang}: {doc}' for doc in self.book.get_docs()]
         dlg_menu(DMENU_LIST, items, caption=_('LSP Docs'))
@@ -650,23 +876,86 @@ class Command:
 
         # shutting down and clearing remains
         if name is not None  and  name in self._langs:
-            lang = self._langs.pop(name)
-            lang.shutdown()
+            self._stop_server(self._langs.pop(name))
 
-            # remove referencees to Language object
-            for doc in self.book.get_docs():
-                if doc.lang == lang:
-                    doc.update(lang=None)
+    def _stop_server(self, lang):
+        """ shutdown, then 'exit' on response -- stops Language's timers, clears its diagnostics
+        """
+        lang.shutdown()
+        lang.process_queues() # send now
+
+        # remove referencees to Language object
+        for doc in self.book.get_docs():
+            if doc.lang == lang:
+                doc.update(lang=None)
+
+        # server can have multiple langids - remove all
+        lang_ids = [langid for langid,lang_ in self._langs.items()  if lang_ == lang]
+        for langid in lang_ids:
+            del self._langs[langid]
+
+    def _park_server(self, lang):
+        """ on project folder change: detach server from documents, keep it running in pool
+        """
+        pass;       LOG and print(f'* parking server: {lang.name}, {lang.work_dir}')
+        for doc in self.book.get_docs():
+            if doc.lang == lang:
+                lang.on_close(doc) # didClose
+                doc.update(lang=None)
+        lang.diagnostics_man.clear()
+        # keeps running -- later publishes are not for current project
+        lang.diagnostics_man.detach_problems()
+
+        for langid in [langid for langid,lang_ in self._langs.items()  if lang_ == lang]:
+            del self._langs[langid]
+
+        key = (lang.name, lang.work_dir)
+        self._pool[key] = (lang, time.time())
+        self._pool.move_to_end(key)
+        while len(self._pool) > SERVER_POOL_MAX:
+            _key,(old_lang,_park_time) = self._pool.popitem(last=False)
+            pass;       LOG and print(f'* pool full, shutting down: {_key}')
+            self._stop_server(old_lang)
+
+        timer_proc(TIMER_START, self._pool_timer, SERVER_POOL_CHECK_PERIOD)
+
+    def _unpark_server(self, name, root_dir):
+        """ returns: pooled Language for server `name` and folder, registered back to `_langs`
+        """
+        item = self._pool.pop((name, root_dir), None)
+        if item is None:
+            return None
+
+        lang,_park_time = item
+        pass;       LOG and print(f'* reusing pooled server: {name}, {root_dir}')
+        self._project_dir = root_dir
+        for server_langid in lang.langids:
+            self._langs[server_langid] = lang
+        lang.diagnostics_man.attach_problems(self.problems)
+        return lang
+
+    def _pool_timer(self, tag='', info=''):
+        """ shuts down pooled servers unused for `SERVER_POOL_IDLE_TIME`
+        """
+        now = time.time()
+        for key,(lang,park_time) in list(self._pool.items()):
+            if now - park_time > SERVER_POOL_IDLE_TIME:
+                pass;       LOG and print(f'* pooled server idle, shutting down: {key}')
+                del self._pool[key]
+                self._stop_server(lang)
 
-            # server can have multiple langids - remove all
-            lang_ids = [langid for langid,lang_ in self._langs.items()  if lang_ == lang]
-            for langid in lang_ids:
-                del self._langs[langid]
+        if not self._pool:
+            timer_proc(TIMER_STOP, self._pool_timer, 0)
 
     def shutdown_all_servers(self):
         for name in list(self._langs):
             self.shutdown_server(name=name)
 
+        for lang,_park_time in self._pool.values():
+            self._stop_server(lang)
+        self._pool.clear()
+        timer_proc(TIMER_STOP, self._pool_timer, 0)
+
     def force_didopen(self, *args, **vargs):
         ed_self = Editor(ed.get_prop(PROP_HANDLE_SELF))
 
@@ -692,6 +981,7 @@ class Command:
         global opt_lint_underline_style
         global opt_enable_code_tree
         global opt_tree_types_show
+        global opt_prewarm_servers
 
         # general cfg
         if os.path.exists(fn_config):
@@ -717,6 +1007,7 @@ class Command:
 
             opt_enable_code_tree = j.get('enable_code_tree', opt_enable_code_tree)
             opt_tree_types_show = j.get('tree_types_show', opt_tree_types_show)
+            opt_prewarm_servers = j.get('prewarm_servers', opt_prewarm_servers)
 
             _opt_lint_underline_style = j.get('lint_underline_style', opt_lint_underline_style)
             if _opt_lint_underline_style in LINT_STYLE_MAP:
@@ -796,6 +1087,7 @@ class Command:
             'lint_underline_style':      opt_lint_underline_style,
             'enable_code_tree':          opt_enable_code_tree,
             'tree_types_show':           opt_tree_types_show,
+            'prewarm_servers':           opt_prewarm_servers,
         }
         if opt_manual_didopen is not None:
             j['manual_didopen'] = opt_manual_didopen
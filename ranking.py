@@ -0,0 +1,108 @@
+import heapq
+
+# separators of words in identifiers, besides camelCase
+WORD_SEPS = '_-.$:/ '
+
+SCORE_MATCH = 1
+SCORE_CASE = 1 # same case as typed
+SCORE_BOUNDARY = 8 # start of word: 'gDE' in 'getDocumentElement', 'gde' in 'get_doc_elem'
+SCORE_CONSECUTIVE = 4
+SCORE_FIRST = 16 # match at start of label
+SCORE_PREFIX = 100 # whole prefix matches start of label, or its camelCase humps
+PENALTY_GAP = 1 # per skipped char, up to `PENALTY_GAP_MAX`
+PENALTY_GAP_MAX = 3
+
+
+class CompletionRanker:
+    """ fuzzy ranking of completion items by typed prefix;  only top `k` are returned
+        * matching by `filterText` (or label), camelCase and snake_case aware
+        * ties -- by server's order: `sortText` (label if missing)
+        * when prefix grows, only previous matches are scored
+    """
+    def __init__(self, items):
+        self._keys = [item.filterText or item.label  for item in items]
+        self._keys_low = [key.lower()  for key in self._keys]
+
+        order = sorted(range(len(items)),  key=lambda i: (items[i].sortText or items[i].label, i))
+        self._order = [0]*len(items) # item index -> position in server's order
+        for pos,i in enumerate(order):
+            self._order[i] = pos
+
+        self._prefix = None
+        self._matches = None # item indexes, matching `_prefix`
+
+    def __len__(self):
+        return len(self._keys)
+
+    def rank(self, prefix, k):
+        """ returns: list of item indexes, best first;  at most `k`
+        """
+        if self._prefix is not None  and  prefix.startswith(self._prefix):
+            candidates = self._matches
+        else:
+            candidates = range(len(self._keys))
+
+        if prefix:
+            prefix_low = prefix.lower()
+            keys,keys_low,order = self._keys, self._keys_low, self._order
+            scored = []
+            for i in candidates:
+                score = fuzzy_score(prefix, prefix_low, keys[i], keys_low[i])
+                if score is not None:
+                    scored.append((score, -order[i], i))
+        else:
+            scored = [(0, -self._order[i], i)  for i in candidates]
+
+        self._prefix = prefix
+        self._matches = [i  for _score,_order,i in scored]
+        return [i  for _score,_order,i in heapq.nlargest(k, scored)]
+
+
+def fuzzy_score(pattern, pattern_low, key, key_low):
+    """ returns: score of `pattern` chars found in `key` in order, or None if not found
+        * next char is matched first, then uppercase -- camelCase humps
+        * top scores: prefix of same case (any case if typed lowercase),
+            then humps: 'gDE' in 'getDocumentElement', but not in 'gde'
+    """
+    if key.startswith(pattern)  or  (pattern == pattern_low  and  key_low.startswith(pattern_low)):
+        score = SCORE_PREFIX + SCORE_FIRST + len(pattern)*(SCORE_MATCH + SCORE_CONSECUTIVE)
+        return score + sum(SCORE_CASE  for a,b in zip(pattern, key)  if a == b)
+
+    score = 0
+    pos = 0
+    prev = -2
+    is_humps = True # all chars at word starts or consecutive, typed uppercase -- as uppercase
+    for ch,ch_low in zip(pattern, pattern_low):
+        if prev == pos - 1  and  key_low.startswith(ch_low, pos)  and  (ch == ch_low  or  key[pos] == ch):
+            j = pos # consecutive
+        elif ch != ch_low: # typed uppercase
+            j = key.find(ch, pos)
+        else: # camelCase hump first
+            j = key.find(ch.upper(), pos)
+        if j == -1:
+            j = key_low.find(ch_low, pos)
+            if j == -1:
+                return None
+
+        score += SCORE_MATCH
+        if key[j] == ch:
+            score += SCORE_CASE
+        elif ch != ch_low: # typed uppercase, found lowercase
+            is_humps = False
+        if j == 0:
+            score += SCORE_FIRST
+        elif (key[j-1] in WORD_SEPS
+                or  (key[j].isupper()  and  not key[j-1].isupper())):
+            score += SCORE_BOUNDARY
+        elif j != prev + 1:
+            is_humps = False
+        if j == prev + 1:
+            score += SCORE_CONSECUTIVE
+        else:
+            score -= PENALTY_GAP * min(j - pos, PENALTY_GAP_MAX)
+        prev = j
+        pos = j + 1
+
+    if is_humps:
+        score += SCORE_PREFIX
+    return score
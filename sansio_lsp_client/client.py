@@ -29,8 +29,13 @@ from .events import (
     Declaration,
     TypeDefinition,
     RegisterCapabilityRequest,
+    UnregisterCapabilityRequest,
     MDocumentSymbols,
     DocumentFormatting,
+    SemanticTokens,
+    SemanticTokensDelta,
+    InlayHints,
+    CompletionItemResolved,
     Progress,
     WorkDoneProgress,
     WorkDoneProgressCreate,
@@ -76,7 +81,6 @@ class ClientState(enum.Enum):
     SHUTDOWN = enum.auto()
     EXITED = enum.auto()
 
-#NOTE: Server capabilitie: resolveProvider - info about completion item -- can't use?
 CAPABILITIES = {
     'textDocument': {
         'synchronization': {
@@ -93,7 +97,12 @@ CAPABILITIES = {
         'completion': {
             'dynamicRegistration': True,
             'completionItem': {
-                'snippetSupport': False
+                'snippetSupport': False,
+                'documentationFormat': ['markdown', 'plaintext'],
+                # lazy properties -- 'completionItem/resolve' on accept
+                'resolveSupport': {
+                    'properties': ['documentation', 'detail', 'additionalTextEdits'],
+                },
             },
             'completionItemKind': {
                 'valueSet': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25]
@@ -142,6 +151,31 @@ CAPABILITIES = {
             'dynamicRegistration': True
         },
 
+        'semanticTokens': {
+            'dynamicRegistration': True,
+            'requests': {
+                'range': True,
+                'full': {'delta': True},
+            },
+            'tokenTypes': [
+                'namespace', 'type', 'class', 'enum', 'interface', 'struct', 'typeParameter',
+                'parameter', 'variable', 'property', 'enumMember', 'event', 'function', 'method',
+                'macro', 'keyword', 'modifier', 'comment', 'string', 'number', 'regexp', 'operator',
+                'decorator',
+            ],
+            'tokenModifiers': [
+                'declaration', 'definition', 'readonly', 'static', 'deprecated', 'abstract',
+                'async', 'modification', 'documentation', 'defaultLibrary',
+            ],
+            'formats': ['relative'],
+            'overlappingTokenSupport': False,
+            'multilineTokenSupport': False,
+        },
+
+        'inlayHint': {
+            'dynamicRegistration': True,
+        },
+
         'documentSymbol': {  # Document Symbols Request
             'hierarchicalDocumentSymbolSupport': True,
             'dynamicRegistration': True,
@@ -301,6 +335,10 @@ class Client:
 
             event = Completion(message_id=response.id, completion_list=completion_list)
 
+        elif request.method == "completionItem/resolve":
+            event = CompletionItemResolved(message_id=response.id,
+                                            item=CompletionItem.parse_obj(response.result))
+
         elif request.method == "textDocument/willSaveWaitUntil":
             event = WillSaveWaitUntilEdits(
                 edits=parse_obj_as(t.List[TextEdit], response.result)
@@ -350,9 +388,21 @@ class Client:
             event = parse_obj_as(DocumentFormatting, response)
             event.message_id = response.id
 
+        # token lists are big -- not validated
+        elif (request.method == "textDocument/semanticTokens/full"
+                or request.method == "textDocument/semanticTokens/range"):
+            event = SemanticTokens.construct(message_id=response.id, result=response.result)
+
+        elif request.method == "textDocument/semanticTokens/full/delta":
+            event = SemanticTokensDelta.construct(message_id=response.id, result=response.result)
+
+        elif request.method == "textDocument/inlayHint":
+            event = InlayHints.construct(message_id=response.id, result=response.result)
+
         # WORKSPACE
         elif request.method == "workspace/symbol":
             event = parse_obj_as(MWorkspaceSymbols, response)
+            event.message_id = response.id
 
         else:
             raise NotImplementedError((response, request))
@@ -415,6 +465,8 @@ class Client:
 
         elif request.method == "client/registerCapability":
             return parse_request(RegisterCapabilityRequest)
+        elif request.method == "client/unregisterCapability":
+            return parse_request(UnregisterCapabilityRequest)
 
         else:
             raise NotImplementedError(request)
@@ -441,8 +493,8 @@ class Client:
         return events
 
     def send(self) -> bytes:
-        send_buf = self._send_buf[:]
-        self._send_buf.clear()
+        send_buf = self._send_buf
+        self._send_buf = bytearray()  # hand over without copying
         return send_buf
 
     def shutdown(self) -> None:
@@ -464,7 +516,7 @@ class Client:
     def did_open(self, text_document: TextDocumentItem) -> None:
         assert self._state == ClientState.NORMAL
         self._send_notification(
-            method="textDocument/didOpen", params={"textDocument": text_document.dict()}
+            method="textDocument/didOpen", params={"textDocument": text_document}
         )
 
     def did_change(
@@ -476,8 +528,8 @@ class Client:
         self._send_notification(
             method="textDocument/didChange",
             params={
-                "textDocument": text_document.dict(),
-                "contentChanges": [evt.dict() for evt in content_changes],
+                "textDocument": text_document,
+                "contentChanges": content_changes,
             },
         )
 
@@ -542,6 +594,11 @@ class Client:
             params.update(context.dict())
         return self._send_request(method="textDocument/completion", params=params)
 
+    def completion_item_resolve(self, item: CompletionItem) -> int:
+        assert self._state == ClientState.NORMAL
+        # item as it was received -- without unset fields
+        return self._send_request(method="completionItem/resolve", params=item.dict(exclude_unset=True))
+
 # NEW #####################
     def hover(
             self,
@@ -652,6 +709,47 @@ class Client:
             params={'query': query},
         )
 
+    def semantic_tokens_full(self, text_document: TextDocumentIdentifier) -> int:
+        assert self._state == ClientState.NORMAL
+        return self._send_request(
+            method="textDocument/semanticTokens/full",
+            params={"textDocument": text_document.dict()},
+        )
+
+    def semantic_tokens_full_delta(
+            self,
+            text_document: TextDocumentIdentifier,
+            previous_result_id: str,
+    ) -> int:
+        assert self._state == ClientState.NORMAL
+        return self._send_request(
+            method="textDocument/semanticTokens/full/delta",
+            params={
+                "textDocument": text_document.dict(),
+                "previousResultId": previous_result_id,
+            },
+        )
+
+    def semantic_tokens_range(self, text_document: TextDocumentIdentifier, range: Range) -> int:
+        assert self._state == ClientState.NORMAL
+        return self._send_request(
+            method="textDocument/semanticTokens/range",
+            params={
+                "textDocument": text_document.dict(),
+                "range": range.dict(),
+            },
+        )
+
+    def inlay_hints(self, text_document: TextDocumentIdentifier, range: Range) -> int:
+        assert self._state == ClientState.NORMAL
+        return self._send_request(
+            method="textDocument/inlayHint",
+            params={
+                "textDocument": text_document.dict(),
+                "range": range.dict(),
+            },
+        )
+
     def doc_symbol(self, text_document: TextDocumentIdentifier) -> int:
         assert self._state == ClientState.NORMAL
         return self._send_request(
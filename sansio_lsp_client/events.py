@@ -24,6 +24,7 @@ from .structs import (
     CallHierarchyItem,
     SymbolInformation,
     Registration,
+    Unregistration,
     DocumentSymbol,
     WorkspaceFolder,
     ProgressToken,
@@ -127,6 +128,11 @@ class Completion(Event):
     completion_list: t.Optional[CompletionList]
 
 
+class CompletionItemResolved(Event):
+    message_id: Id
+    item: CompletionItem
+
+
 # XXX: not sure how to name this event.
 class WillSaveWaitUntilEdits(Event):
     edits: t.Optional[t.List[TextEdit]]
@@ -201,6 +207,7 @@ class Implementation(Event):
         None]
 
 class MWorkspaceSymbols(Event):
+    message_id: t.Optional[Id] # custom...
     result: t.Union[t.List[SymbolInformation], None]
 
 class MDocumentSymbols(Event):
@@ -227,10 +234,38 @@ class RegisterCapabilityRequest(ServerRequest):
     def reply(self) -> None:
         self._client._send_response(id=self._id, result={})
 
+class UnregisterCapabilityRequest(ServerRequest):
+    unregisterations: t.List[Unregistration] # sic, misspelled in spec
+
+    def reply(self) -> None:
+        self._client._send_response(id=self._id, result={})
+
 class DocumentFormatting(Event):
     message_id: t.Optional[Id] # custom...
     result: t.Union[t.List[TextEdit], None]
 
+class SemanticTokens(Event):
+    """ response to 'textDocument/semanticTokens/full' and '.../range'
+    """
+    message_id: t.Optional[Id] # custom...
+    # {'resultId'?: str, 'data': [int, ...]}  -- not validated, can be huge
+    result: t.Any
+
+class SemanticTokensDelta(Event):
+    """ response to 'textDocument/semanticTokens/full/delta'
+    """
+    message_id: t.Optional[Id] # custom...
+    # {'resultId'?: str, 'edits': [{'start', 'deleteCount', 'data'?}, ...]}
+    #   or full tokens, like `SemanticTokens.result`
+    result: t.Any
+
+class InlayHints(Event):
+    """ response to 'textDocument/inlayHint'
+    """
+    message_id: t.Optional[Id] # custom...
+    # [{'position': Position, 'label': str | [{'value': str, ...}], ...}, ...] or None  -- not validated
+    result: t.Any
+
 class WorkspaceFolders(ServerRequest):
     result: None
 
@@ -1,4 +1,5 @@
 import cgi
+import enum
 import json
 import typing as t
 
@@ -7,6 +8,92 @@ from pydantic import parse_obj_as
 from .structs import Request, Response, JSONDict
 
 
+_custom_dict_types: t.Dict[type, bool] = {}
+
+
+def _has_custom_dict(cls: type) -> bool:
+    """ model class overrides `.dict()` (e.g. drops unset fields) """
+    result = _custom_dict_types.get(cls)
+    if result is None:
+        result = any("dict" in vars(c) for c in cls.__mro__
+                                            if not c.__module__.startswith("pydantic"))
+        _custom_dict_types[cls] = result
+    return result
+
+
+def _json_default(obj: t.Any) -> t.Any:
+    """ model objects are encoded from their fields directly, without `.dict()` copies;
+        same output as `.dict()` -- all fields, by name
+    """
+    if hasattr(obj, "__fields__"):  # pydantic model
+        if _has_custom_dict(type(obj)):
+            return obj.dict()
+        return obj.__dict__
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class JsonCodec:
+    """ stdlib `json`, compact;  non-ascii is escaped -- faster than encoding unescaped to utf-8 """
+
+    name = "json"
+
+    def __init__(self) -> None:
+        self._encoder = json.JSONEncoder(separators=(",", ":"), default=_json_default)
+
+    def dumps(self, obj: t.Any) -> bytes:
+        return self._encoder.encode(obj).encode("utf-8")
+
+    def loads(self, data: bytes) -> t.Any:
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    """ `orjson`, used when importable """
+
+    name = "orjson"
+
+    def __init__(self) -> None:
+        import orjson
+
+        self._orjson = orjson
+
+    def dumps(self, obj: t.Any) -> bytes:
+        return self._orjson.dumps(obj, default=_json_default)
+
+    def loads(self, data: bytes) -> t.Any:
+        return self._orjson.loads(data)
+
+
+_codec: t.Any = None
+
+
+def get_codec() -> t.Any:
+    """ returns: codec in use -- `dumps(obj) -> utf-8 bytes`, `loads(bytes)`;
+        default is chosen on first use
+    """
+    global _codec
+    if _codec is None:
+        try:
+            _codec = OrjsonCodec()
+        except ImportError:
+            _codec = JsonCodec()
+    return _codec
+
+
+def set_codec(codec: t.Any) -> None:
+    global _codec
+    _codec = codec
+
+
+def _encode_content(content: JSONDict, encoding: str) -> bytes:
+    encoded_content = get_codec().dumps(content)
+    if encoding.lower() not in ("utf-8", "utf8"):
+        encoded_content = encoded_content.decode("utf-8").encode(encoding)
+    return encoded_content
+
+
 def _make_headers(content_length: int, encoding: str = "utf-8") -> bytes:
     headers_bytes = bytearray()
     headers = {
@@ -34,7 +121,7 @@ def _make_request(
         content["params"] = params
     if id is not None:
         content["id"] = id
-    encoded_content = json.dumps(content).encode(encoding)
+    encoded_content = _encode_content(content, encoding)
 
     # Write the headers to the request body
     request += _make_headers(content_length=len(encoded_content), encoding=encoding)
@@ -60,7 +147,7 @@ def _make_response(
         content["result"] = result
     if error is not None:
         content["error"] = error
-    encoded_content = json.dumps(content).encode(encoding)
+    encoded_content = _encode_content(content, encoding)
 
     # Write the headers to the request body
     request += _make_headers(content_length=len(encoded_content), encoding=encoding)
@@ -151,7 +238,10 @@ def _parse_one_message(
         del data["jsonrpc"]
         return parse_obj_as(t.Union[Request, Response], data)  # type: ignore
 
-    content = json.loads(raw_content.decode(encoding))
+    if encoding.lower() in ("utf-8", "utf8"):
+        content = get_codec().loads(raw_content)
+    else:
+        content = get_codec().loads(raw_content.decode(encoding).encode("utf-8"))
 
     if isinstance(content, list):
         # This is in response to a batch operation.
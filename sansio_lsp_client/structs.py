@@ -408,6 +408,10 @@ class Registration(BaseModel):
     method: str
     registerOptions: t.Optional[t.Any]
 
+class Unregistration(BaseModel):
+    id: str
+    method: str
+
 
 class FormattingOptions(BaseModel):
     tabSize: int
@@ -0,0 +1,112 @@
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+
+from cudatext import *
+
+SEMTOK_TAG = app_proc(PROC_GET_UNIQUE_TAG, '')
+
+# token type -> syntax-theme style;  types not here are left to lexer
+TOKEN_STYLES = {
+    'namespace':        'Id2',
+    'type':             'Id1',
+    'class':            'Id1',
+    'enum':             'Id1',
+    'interface':        'Id1',
+    'struct':           'Id1',
+    'typeParameter':    'Id1',
+    'parameter':        'IdVar',
+    'enumMember':       'Id3',
+    'function':         'Id4',
+    'method':           'Id4',
+    'macro':            'Id3',
+    'decorator':        'Id3',
+}
+MODIFIER_DEPRECATED = 'deprecated'
+
+
+class SemanticTokens:
+    """ tokens of a document in LSP relative encoding: 5 ints per token
+            (deltaLine, deltaStart, length, tokenType, tokenModifiers), in `array('I')`
+        * delta edits are applied in place
+        * absolute lines are computed on first render after change;  columns -- only for rendered
+    """
+    __slots__ = ('data', 'result_id', '_lines')
+
+    def __init__(self, data, result_id=None):
+        self.data = array('I', data)
+        self.result_id = result_id
+        self._lines = None # array: token index -> absolute line
+
+    def __len__(self):
+        return len(self.data) // 5
+
+    def apply_edits(self, edits, result_id):
+        """ edits -- list of SemanticTokensEdit dicts: start, deleteCount, data?
+        """
+        data = self.data
+        # from the end -- earlier edits' offsets stay valid
+        for edit in sorted(edits, key=lambda e: e['start'], reverse=True):
+            start = edit['start']
+            data[start : start+edit['deleteCount']] = array('I', edit.get('data') or ())
+        self.result_id = result_id
+        self._lines = None
+
+    def get_tokens(self, line0, line1):
+        """ returns: list of (line, column, length, type index, modifiers) for lines [line0, line1)
+        """
+        lines = self._lines
+        if lines is None:
+            lines = self._lines = array('I', accumulate(self.data[0::5]))
+
+        i0 = bisect_left(lines, line0)
+        i1 = bisect_left(lines, line1)
+        if i0 >= i1:
+            return []
+
+        # columns are relative to previous token on same line;  `i0` is first on its line
+        data = self.data
+        tokens = []
+        col = 0
+        for i in range(i0, i1):
+            j = i*5
+            if i == i0  or  data[j]: # new line
+                col = data[j+1]
+            else:
+                col += data[j+1]
+            tokens.append((lines[i], col, data[j+2], data[j+3], data[j+4]))
+        return tokens
+
+
+def render_tokens(ed, tokens, legend):
+    """ replaces semantic markers in `ed` with `tokens`, colored by syntax-theme
+        legend -- server's SemanticTokensLegend dict: tokenTypes, tokenModifiers
+    """
+    ed.attr(MARKERS_DELETE_BY_TAG, tag=SEMTOK_TAG)
+    if not tokens:
+        return
+
+    token_types = legend.get('tokenTypes', [])
+    token_mods = legend.get('tokenModifiers', [])
+    deprecated_bit = 1 << token_mods.index(MODIFIER_DEPRECATED)  if MODIFIER_DEPRECATED in token_mods else  0
+
+    theme = app_proc(PROC_THEME_SYNTAX_DICT_GET, '')
+    groups = {} # (style name, is deprecated) -> (xs, ys, lens)
+    for line,col,length,type_ind,mods in tokens:
+        type_name = token_types[type_ind]  if type_ind < len(token_types) else  None
+        style_name = TOKEN_STYLES.get(type_name)
+        if style_name is None:
+            continue
+        xs,ys,lens = groups.setdefault((style_name, bool(mods & deprecated_bit)), ([],[],[]))
+        xs.append(col)
+        ys.append(line)
+        lens.append(length)
+
+    for (style_name,is_deprecated),(xs,ys,lens) in groups.items():
+        style = theme.get(style_name)
+        if not style:
+            continue
+        ed.attr(MARKERS_ADD_MANY,  tag=SEMTOK_TAG,  x=xs,  y=ys,  len=lens,
+                    color_font=style['color_font'],
+                    color_border=style['color_font']  if is_deprecated else  COLOR_NONE,
+                    border_down=1  if is_deprecated else  0)
@@ -0,0 +1,168 @@
+import heapq
+from array import array
+from collections import namedtuple, OrderedDict
+
+from .ranking import fuzzy_score, WORD_SEPS
+
+SYMBOLS_MAX = 200000 # per server;  files updated least recently are dropped over it
+COMPACT_MIN_DEAD = 10000 # removed symbols, before index is rebuilt
+
+Symbol = namedtuple('Symbol', 'name kind container uri line column')
+
+
+class SymbolIndex:
+    """ workspace symbols of a server, fuzzy searchable by name -- ranked as completions
+        * trigram postings: lowercase trigram of name or of its word starts -> symbol ids;
+            query's first 3 chars must be found as one of them: 'gde' -- in 'gde', 'getDocumentElement',
+            'get_doc_elem';  shorter queries -- by prefix scan
+        * 'documentSymbol' result replaces file's symbols, 'workspace/symbol' results are merged
+        * removed symbols are left in postings as dead ids, until compacted
+    """
+    def __init__(self, max_symbols=SYMBOLS_MAX):
+        self.max_symbols = max_symbols
+
+        self._syms = [] # id -> Symbol, or None if removed
+        self._names_low = [] # id -> lowercase name, or None if removed
+        self._grams = {} # trigram -> array of ids
+        self._files = OrderedDict() # uri -> {(name, line, column): id};  last -- most recently updated
+        self._count = 0 # live symbols
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, uri):
+        return uri in self._files
+
+    def set_file(self, uri, symbols):
+        """ symbols -- all symbols of `uri`
+        """
+        self._remove_file(uri)
+        keys = self._files[uri] = {}
+        for sym in symbols:
+            key = (sym.name, sym.line, sym.column)
+            if key not in keys:
+                keys[key] = self._add(sym)
+        self._trim()
+
+    def add(self, symbols):
+        """ symbols -- partial, from any files
+        """
+        for sym in symbols:
+            keys = self._files.get(sym.uri)
+            if keys is None:
+                keys = self._files[sym.uri] = {}
+            else:
+                self._files.move_to_end(sym.uri)
+            key = (sym.name, sym.line, sym.column)
+            if key not in keys:
+                keys[key] = self._add(sym)
+        self._trim()
+
+    def search(self, query, k):
+        """ returns: list of Symbols fuzzy matching `query`, best first;  at most `k`
+        """
+        if not query:
+            return []
+        query_low = query.lower()
+        names_low = self._names_low
+
+        if len(query_low) < 3: # too many matches to score -- only by prefix, shorter first
+            matches = ((-len(name_low), -i, i)  for i,name_low in enumerate(names_low)
+                            if name_low is not None  and  name_low.startswith(query_low))
+            return [self._syms[i]  for *_sort,i in heapq.nlargest(k, matches)]
+
+        scored = []
+        for i in self._grams.get(query_low[:3], ()):
+            name_low = names_low[i]
+            if name_low is not None:
+                name = self._syms[i].name
+                score = fuzzy_score(query, query_low, name, name_low)
+                if score is not None:
+                    scored.append((score, -len(name), -i, i))
+        return [self._syms[i]  for *_sort,i in heapq.nlargest(k, scored)]
+
+    def get_stats(self):
+        return {
+            'files': len(self._files),
+            'symbols': self._count,
+            'dead': len(self._syms) - self._count,
+            'trigrams': len(self._grams),
+        }
+
+    def _add(self, sym):
+        id_ = len(self._syms)
+        name_low = sym.name.lower()
+        self._syms.append(sym)
+        self._names_low.append(name_low)
+        for gram in _trigrams(name_low) | _trigrams(_word_starts(sym.name)):
+            ids = self._grams.get(gram)
+            if ids is None:
+                ids = self._grams[gram] = array('l')
+            ids.append(id_)
+        self._count += 1
+        return id_
+
+    def _remove_file(self, uri):
+        keys = self._files.pop(uri, None)
+        if keys:
+            for id_ in keys.values():
+                self._syms[id_] = None
+                self._names_low[id_] = None
+            self._count -= len(keys)
+
+    def _trim(self):
+        while self._count > self.max_symbols  and  len(self._files) > 1:
+            self._remove_file(next(iter(self._files)))
+
+        dead = len(self._syms) - self._count
+        if dead > COMPACT_MIN_DEAD  and  dead > self._count:
+            self._compact()
+
+    def _compact(self):
+        """ rebuild without removed symbols
+        """
+        files = [(uri, [self._syms[id_]  for id_ in keys.values()])  for uri,keys in self._files.items()]
+        self._syms.clear()
+        self._names_low.clear()
+        self._grams.clear()
+        self._files.clear()
+        self._count = 0
+        for uri,syms in files:
+            self._files[uri] = {(sym.name, sym.line, sym.column): self._add(sym)  for sym in syms}
+
+
+def from_doc_symbols(uri, result):
+    """ result -- list of DocumentSymbol (hierarchy) or SymbolInformation
+        returns: list of Symbol
+    """
+    symbols = []
+    stack = [(item, None)  for item in reversed(result or ())]
+    while stack:
+        item,container = stack.pop()
+        if hasattr(item, 'location'): # SymbolInformation
+            symbols.append(_from_syminfo(item))
+            continue
+        start = item.selectionRange.start
+        symbols.append(Symbol(item.name, item.kind, container, uri, start.line, start.character))
+        if item.children:
+            stack.extend((child, item.name)  for child in reversed(item.children))
+    return symbols
+
+def from_ws_symbols(result):
+    """ result -- list of SymbolInformation
+    """
+    return [_from_syminfo(item)  for item in result or ()]
+
+def _from_syminfo(item):
+    start = item.location.range.start
+    return Symbol(item.name, item.kind, item.containerName, item.location.uri, start.line, start.character)
+
+def _trigrams(s):
+    return {s[i:i+3]  for i in range(len(s) - 2)}
+
+def _word_starts(name):
+    """ returns: lowercase first chars of words in `name`: 'getDocumentElement' -> 'gde'
+    """
+    return ''.join(ch  for i,ch in enumerate(name)
+                    if i == 0  or  (name[i-1] in WORD_SEPS  and  ch not in WORD_SEPS)
+                        or  (ch.isupper()  and  not name[i-1].isupper())).lower()
@@ -1,5 +1,7 @@
 import os
+import time
 import pathlib
+from collections import namedtuple, deque
 
 import cudatext as ct
 
@@ -7,6 +9,8 @@ from .dlg import Hint
 
 USER_DIR = os.path.expanduser('~')
 
+DbgRecord = namedtuple('DbgRecord', 'time kind size obj')
+
 def get_first(gen):
     try:
         #if notnone:
@@ -142,6 +146,46 @@ class TimerScheduler:
         ct.timer_proc(ct.TIMER_STOP, self.timer_callback, 0)
 
 
+class DbgCapture:
+    """ ring buffer of recent messages for debug commands
+        mode is shared by all captures, toggled at runtime:
+            MODE_OFF -- nothing kept
+            MODE_META -- kind, size, time
+            MODE_FULL -- also message object
+    """
+    MODE_OFF = 'off'
+    MODE_META = 'meta'
+    MODE_FULL = 'full'
+    MODES = [MODE_OFF, MODE_META, MODE_FULL]
+
+    mode = MODE_META # full payloads -- opt-in: `dbg_capture_mode`
+
+    def __init__(self, maxlen):
+        self._records = deque(maxlen=maxlen)
+
+    def __len__(self):
+        return len(self._records)
+
+    def add(self, obj, kind=None, size=None):
+        mode = DbgCapture.mode
+        if mode == DbgCapture.MODE_OFF:
+            return
+        if kind is None:
+            kind = type(obj).__name__
+        obj = obj  if mode == DbgCapture.MODE_FULL else  None
+        self._records.append(DbgRecord(time.time(), kind, size, obj))
+
+    def get_records(self):
+        return list(self._records)
+
+    def clear(self):
+        self._records.clear()
+
+    @classmethod
+    def set_mode(cls, mode):
+        cls.mode = mode
+
+
 def update_lexmap(upd):
     lex_ids.update(upd)
 